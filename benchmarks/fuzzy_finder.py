@@ -0,0 +1,79 @@
+"""
+### Benchmark de `fuzzy.finder` sur des entrées adverses
+Compare l'ancienne recherche par regex (`'.*?'.join(...)`, sujette au backtracking) au parcours linéaire actuel.
+
+Usage : `python -m benchmarks.fuzzy_finder [--budget SECONDES]`
+"""
+
+import argparse
+import multiprocessing
+import random
+import re
+import time
+
+from common.utils import fuzzy
+
+REPEAT = 20
+
+def legacy_search(query: str, text: str):
+    """Ancienne implémentation de `finder` (une seule clé)"""
+    regex = re.compile('.*?'.join(map(re.escape, query)), flags=re.IGNORECASE)
+    r = regex.search(text)
+    return (len(r.group()), r.start()) if r else None
+
+def _timed_legacy(query: str, text: str) -> float:
+    start = time.perf_counter()
+    legacy_search(query, text)
+    return time.perf_counter() - start
+
+def time_legacy(query: str, text: str, budget: float) -> float | None:
+    """Mesure la regex dans un processus séparé : elle peut ne jamais rendre la main
+    
+    :return: Durée en secondes, ou None si le budget est dépassé"""
+    with multiprocessing.Pool(1) as pool:
+        result = pool.apply_async(_timed_legacy, (query, text))
+        try:
+            return result.get(timeout=budget)
+        except multiprocessing.TimeoutError:
+            return None
+
+def time_linear(query: str, text: str) -> tuple[float, float]:
+    """Mesure le parcours linéaire
+    
+    :return: Durées médiane et maximale en secondes"""
+    durations = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fuzzy.finder(query, [text])
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2], durations[-1]
+
+def cases() -> list[tuple[str, str, str]]:
+    rng = random.Random(0)
+    words = "le la les un une des cookie fortune chance avenir demain soleil pluie ami amour travail voyage surprise".split()
+    sentence = ' '.join(rng.choice(words) for _ in range(400))
+    pasted = ' '.join(rng.choice(words) for _ in range(20))[:100]
+    return [
+        ("Répétition sans issue (k=2, n=200)", 'a' * 2 + 'b', 'a' * 200),
+        ("Répétition sans issue (k=3, n=200)", 'a' * 3 + 'b', 'a' * 200),
+        ("Répétition sans issue (k=5, n=200)", 'a' * 5 + 'b', 'a' * 200),
+        ("Requête collée de 100 car. sans issue", 'a' * 99 + 'b', 'a' * 2000),
+        ("Requête collée de 100 car. (texte naturel)", pasted + 'z', sentence),
+        ("Autocomplétion courante", 'fortune', sentence[:60]),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=2.0, help="Temps maximal accordé à la regex par cas (secondes)")
+    args = parser.parse_args()
+    
+    print(f"{'Cas':<45} {'Regex':>12} {'Linéaire p50':>14} {'Linéaire max':>14}")
+    for name, query, text in cases():
+        legacy = time_legacy(query, text, args.budget)
+        p50, worst = time_linear(query, text)
+        legacy_txt = f'{legacy * 1000:.2f} ms' if legacy is not None else f'> {args.budget:g} s'
+        print(f"{name:<45} {legacy_txt:>12} {p50 * 1000:>11.3f} ms {worst * 1000:>11.3f} ms")
+        
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+### Suite de micro-benchmarks de `common/utils/fuzzy.py`
+Mesure les scoreurs (`ratio`, `quick_ratio`, `partial_ratio` et leurs variantes à tri de tokens), `extract`, `extract_one`,
+`finder` et l'autocomplétion (`AutocompleteCache`, sur une liste ou un `FuzzyIndex`) sur des corpus synthétiques de textes « à la française » (100 à 100k chaînes), avec des requêtes courtes,
+longues et adverses. Chaque cas rapporte le débit (op/s), les latences p50/p99 et le pic d'allocations (tracemalloc).
+
+Une mesure peut être sauvegardée comme référence puis comparée aux suivantes : les régressions au-delà du seuil sont
+signalées et le code de sortie vaut 1.
+
+Usage : `python -m benchmarks.fuzzy_suite [--sizes 100,1000] [--filter REGEX] [--save FICHIER] [--compare FICHIER]`
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from common.utils import fuzzy
+
+from .fuzzy_scorers import SCORERS, make_text
+
+SIZES = [100, 1_000, 10_000, 100_000]
+PAIRWISE_SAMPLE = 1_000
+
+QUERIES : dict[str, Callable[[random.Random], str]] = {
+    'courte': lambda rng: make_text(rng, 1, 1),
+    'longue': lambda rng: make_text(rng, 8, 12),
+    # Un caractère très fréquent répété : nombreux blocs partiels pour difflib, parcours complet pour finder
+    'adverse': lambda rng: 'e' * 40 + 'z',
+}
+
+@dataclass
+class Result:
+    name: str
+    ops: float
+    p50: float # µs
+    p99: float # µs
+    peak: float # Kio alloués au pire pendant un appel
+
+def make_corpus(size: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [make_text(rng, 1, 10) for _ in range(size)]
+
+def measure(name: str, calls: list[Callable[[], object]], *, budget: float, min_runs: int) -> Result:
+    """Répète les appels (en boucle) jusqu'à épuiser le budget, puis en rejoue quelques-uns sous tracemalloc"""
+    samples = []
+    start = time.perf_counter()
+    i = 0
+    while len(samples) < min_runs or time.perf_counter() - start < budget:
+        call = calls[i % len(calls)]
+        t = time.perf_counter_ns()
+        call()
+        samples.append(time.perf_counter_ns() - t)
+        i += 1
+    total = sum(samples) / 1e9
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else [samples[0]] * 99
+
+    # tracemalloc ralentit fortement l'exécution : mesure séparée, sur quelques appels seulement
+    peak = 0
+    tracemalloc.start()
+    try:
+        for call in calls[:min(len(calls), 20)]:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return Result(name, len(samples) / total, cuts[49] / 1000, cuts[98] / 1000, peak / 1024)
+
+def build_cases(sizes: list[int], seed: int) -> list[tuple[str, list[Callable[[], object]], int]]:
+    """Liste des cas : (nom, appels à répéter, nombre minimal d'appels)"""
+    rng = random.Random(seed)
+    queries = {kind: gen(rng) for kind, gen in QUERIES.items()}
+    cases = []
+
+    # Scoreurs : une opération = une comparaison requête/choix
+    sample = make_corpus(PAIRWISE_SAMPLE, seed)
+    for scorer_name, scorer in SCORERS.items():
+        for backend in ('difflib', 'bitparallel'):
+            for kind, query in queries.items():
+                calls = [lambda c=c, s=scorer, q=query, b=backend: s(q, c, backend=b) for c in sample]
+                cases.append((f'{scorer_name}[{backend}]/{kind}', calls, 100))
+
+    # Recherches : une opération = un appel sur tout le corpus
+    for size in sizes:
+        corpus = make_corpus(size, seed + size)
+        index = fuzzy.FuzzyIndex(corpus)
+        for kind, query in queries.items():
+            q = query
+            cases.append((f'extract[quick_ratio]/{size}/{kind}', [lambda q=q, c=corpus: fuzzy.extract(q, c)], 3))
+            cases.append((f'extract[token_sort_ratio]/{size}/{kind}', [lambda q=q, c=corpus: fuzzy.extract(q, c, scorer=fuzzy.token_sort_ratio)], 3))
+            cases.append((f'extract_one/{size}/{kind}', [lambda q=q, c=corpus: fuzzy.extract_one(q, c)], 3))
+            # finder est utilisé en autocomplétion : requête tronquée à quelques caractères
+            cases.append((f'finder/{size}/{kind}', [lambda q=q[:12], c=corpus: fuzzy.finder(q, c)], 3))
+            # Autocomplétion sans cache valide : corpus entier, ou seulement les candidats de l'index (clés déjà normalisées)
+            cache = fuzzy.AutocompleteCache()
+            cases.append((f'autocomplete[liste]/{size}/{kind}', [lambda q=q[:12], c=corpus, a=cache: (a.invalidate(), a.finder(0, 0, q, c))], 3))
+            cases.append((f'autocomplete[index]/{size}/{kind}', [lambda q=q[:12], i=index, a=cache: (a.invalidate(), a.finder(0, 0, q, i))], 3))
+    return cases
+
+def compare(results: list[Result], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Liste les régressions par rapport à la référence (débit, p99 ou mémoire au-delà du seuil)"""
+    regressions = []
+    for r in results:
+        ref = baseline.get(r.name)
+        if not ref:
+            continue
+        if r.ops < ref['ops'] * (1 - threshold):
+            regressions.append(f"{r.name} : débit {ref['ops']:,.0f} → {r.ops:,.0f} op/s")
+        if r.p99 > ref['p99'] * (1 + threshold):
+            regressions.append(f"{r.name} : p99 {ref['p99']:,.1f} → {r.p99:,.1f} µs")
+        # Marge fixe : les petits pics varient de quelques centaines d'octets d'une exécution à l'autre
+        if r.peak > ref['peak'] * (1 + threshold) + 1:
+            regressions.append(f"{r.name} : mémoire {ref['peak']:,.1f} → {r.peak:,.1f} Kio")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')], default=SIZES, help="Tailles de corpus, séparées par des virgules")
+    parser.add_argument('--filter', type=re.compile, default=None, help="N'exécuter que les cas dont le nom correspond à cette regex")
+    parser.add_argument('--budget', type=float, default=0.3, help="Durée minimale de mesure par cas, en secondes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='FICHIER', help="Sauvegarder les résultats comme référence (JSON)")
+    parser.add_argument('--compare', metavar='FICHIER', help="Comparer à une référence sauvegardée")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Écart toléré avant de signaler une régression (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'Cas':<46} {'op/s':>12} {'p50 (µs)':>11} {'p99 (µs)':>11} {'Pic (Kio)':>10}" + (f" {'Δ op/s':>8}" if baseline else ''))
+    results = []
+    for name, calls, min_runs in build_cases(args.sizes, args.seed):
+        if args.filter and not args.filter.search(name):
+            continue
+        r = measure(name, calls, budget=args.budget, min_runs=min_runs)
+        results.append(r)
+        line = f"{r.name:<46} {r.ops:>12,.0f} {r.p50:>11,.1f} {r.p99:>11,.1f} {r.peak:>10,.1f}"
+        if r.name in baseline:
+            line += f" {r.ops / baseline[r.name]['ops'] - 1:>+8.1%}"
+        print(line, flush=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'seed': args.seed, 'results': {r.name: asdict(r) for r in results}}, f, indent=2)
+        print(f"\nRéférence sauvegardée dans {args.save}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0%} :")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\nAucune régression au-delà de {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
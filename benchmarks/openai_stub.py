@@ -0,0 +1,152 @@
+"""
+### Serveur local compatible avec l'API de complétion d'OpenAI
+Répond à `POST /v1/chat/completions` (avec ou sans streaming) sans appeler OpenAI, pour tester la charge du module `robot`.
+La latence, la longueur des réponses, l'envoi de l'usage et l'injection d'erreurs (429/500 avec `retry-after`) sont réglables.
+
+Usage : `python -m benchmarks.openai_stub [--port 8089] [--latency 0.3] [--token-delay 0.02] [--error-rate 0.05]`
+Puis lancer le bot (ou `benchmarks.robot_load`) avec `OPENAI_BASE_URL=http://127.0.0.1:8089/v1`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+WORDS = "oui non peut-être bien sûr je pense que c'est une bonne idée mais il faudrait voir demain avec les autres membres du serveur".split()
+
+@dataclass
+class StubConfig:
+    latency: float = 0.3 # Secondes avant la réponse (ou le premier fragment)
+    jitter: float = 0.1 # Variation aléatoire de la latence, en secondes
+    token_delay: float = 0.02 # Secondes entre deux fragments en streaming
+    reply_tokens: int = 60 # Longueur des réponses (plafonnée par `max_tokens`)
+    usage: bool = True # Renvoyer l'usage en tokens
+    error_rate: float = 0.0 # Proportion de requêtes en erreur
+    error_status: int = 429
+    retry_after: float | None = 1.0
+    seed: int | None = None
+
+    stats: dict[str, int] = field(default_factory=lambda: {'requests': 0, 'streams': 0, 'errors': 0})
+
+def count_tokens(text: str) -> int:
+    """Approximation du nombre de tokens (un par mot), suffisante pour simuler l'usage"""
+    return len(text.split())
+
+def create_app(config: StubConfig) -> web.Application:
+    rng = random.Random(config.seed)
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        config.stats['requests'] += 1
+        body = await request.json()
+        await asyncio.sleep(max(0.0, config.latency + rng.uniform(-config.jitter, config.jitter)))
+
+        if rng.random() < config.error_rate:
+            config.stats['errors'] += 1
+            headers = {'retry-after': str(config.retry_after)} if config.retry_after is not None else {}
+            kind = 'rate_limit_error' if config.error_status == 429 else 'server_error'
+            return web.json_response({'error': {'message': "Erreur injectée par le serveur de test", 'type': kind, 'param': None, 'code': None}},
+                                     status=config.error_status, headers=headers)
+
+        prompt_tokens = sum(count_tokens(str(m.get('content', ''))) for m in body.get('messages', []))
+        length = min(config.reply_tokens, body.get('max_tokens') or config.reply_tokens)
+        finish_reason = 'length' if length < config.reply_tokens else 'stop'
+        tokens = [rng.choice(WORDS) for _ in range(length)]
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': length, 'total_tokens': prompt_tokens + length}
+        base = {'id': f'chatcmpl-{uuid.uuid4().hex}', 'created': int(time.time()), 'model': body.get('model', 'gpt-3.5-turbo')}
+
+        if not body.get('stream'):
+            return web.json_response({
+                **base,
+                'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(tokens)}, 'finish_reason': finish_reason}],
+                'usage': usage if config.usage else None
+            })
+
+        config.stats['streams'] += 1
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+
+        async def send(choices: list[dict], chunk_usage: dict | None = None):
+            chunk = {**base, 'object': 'chat.completion.chunk', 'choices': choices}
+            if chunk_usage is not None:
+                chunk['usage'] = chunk_usage
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await send([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+        for i, token in enumerate(tokens):
+            await send([{'index': 0, 'delta': {'content': token if i == 0 else ' ' + token}, 'finish_reason': None}])
+            await asyncio.sleep(config.token_delay)
+        await send([{'index': 0, 'delta': {}, 'finish_reason': finish_reason}])
+        if config.usage and (body.get('stream_options') or {}).get('include_usage'):
+            await send([], usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    return app
+
+async def start(config: StubConfig, *, host: str = '127.0.0.1', port: int = 0) -> tuple[web.AppRunner, str]:
+    """Démarre le serveur dans la boucle courante
+
+    :return: Runner (à nettoyer avec `runner.cleanup()`) et URL de base à donner au client OpenAI"""
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    sockets = site._server.sockets if site._server else [] # type: ignore
+    port = sockets[0].getsockname()[1] if sockets else port
+    return runner, f'http://{host}:{port}/v1'
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Options du serveur, partagées avec le harnais de charge"""
+    parser.add_argument('--latency', type=float, default=0.3, help="Latence avant réponse, en secondes")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Variation aléatoire de la latence, en secondes")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="Délai entre deux fragments en streaming, en secondes")
+    parser.add_argument('--reply-tokens', type=int, default=60, help="Longueur des réponses générées, en tokens")
+    parser.add_argument('--no-usage', action='store_true', help="Ne pas renvoyer l'usage en tokens")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proportion de requêtes en erreur (0 à 1)")
+    parser.add_argument('--error-status', type=int, default=429, help="Code HTTP des erreurs injectées")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Valeur de l'en-tête retry-after des erreurs (négatif : absent)")
+    parser.add_argument('--seed', type=int, default=None)
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        token_delay=args.token_delay,
+        reply_tokens=args.reply_tokens,
+        usage=not args.no_usage,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        seed=args.seed
+    )
+
+async def serve(config: StubConfig, host: str, port: int):
+    runner, url = await start(config, host=host, port=port)
+    print(f"Serveur de test à l'écoute : OPENAI_BASE_URL={url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(config_from_args(args), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+### Test de charge du module `robot` contre le serveur local `benchmarks.openai_stub`
+Envoie des demandes de complétion à un débit cible, avec de faux objets Discord, et mesure la latence de bout en bout
+(p50/p95/p99), le délai avant le premier fragment affiché (streaming) et le débit obtenu.
+
+Scénarios :
+- `chatbot` : `BaseChatbot.get_completion`, un chatbot temporaire par salon simulé
+- `custom` : `CustomChatbot.get_completion`, un chatbot personnalisé (base de données) par salon simulé
+- `handle` : faux messages mentionnant le bot, envoyés dans la file de complétions du salon (comme `on_message`) ;
+  les mentions regroupées en un même tour et celles refusées (file pleine) sont comptées
+
+Les données du module sont écrites dans un dossier temporaire. L'encodage tiktoken doit être disponible (en cache ou en ligne),
+sinon `--approx-tokens` compte approximativement un token par mot, comme le serveur de test.
+
+Usage : `python -m benchmarks.robot_load [--scenario handle] [--rate 5] [--duration 20] [--channels 4] [--stream] [--approx-tokens] [--base-url URL]`
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import discord
+
+from cogs.robot.robot import BaseChatbot, Robot, TokenizerService
+
+from . import openai_stub
+
+PROMPTS = "Salut, tu vas bien ?|Raconte-moi une blague.|Quel temps fait-il demain ?|Tu connais un bon livre ?|Résume la conversation.".split('|')
+
+# FAUX OBJETS DISCORD -------------------------------------------------------------------
+
+class FakeBotUser:
+    id = 1
+    name = 'wandr'
+
+    def mentioned_in(self, message) -> bool:
+        return True
+
+class FakeChannel(discord.TextChannel):
+    def __init__(self, channel_id: int, guild: discord.Guild):
+        self.id = channel_id
+        self.guild = guild
+
+    def typing(self):
+        return contextlib.nullcontext()
+
+class FakeMember(discord.Member):
+    def __init__(self, user_id: int, name: str, guild: discord.Guild):
+        self._user = types.SimpleNamespace(id=user_id, name=name, bot=False)
+        self.guild = guild
+
+class FakeMessage:
+    """Message factice : enregistre l'instant de la première réponse visible et la fin de son traitement"""
+    def __init__(self, channel: FakeChannel, author: discord.Member, content: str):
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.first_reply : float | None = None
+        self.done : asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+
+    async def reply(self, content: str, **kwargs) -> 'FakeMessage':
+        if self.first_reply is None:
+            self.first_reply = time.perf_counter()
+        return FakeMessage(self.channel, self.author, content)
+
+    async def edit(self, **kwargs):
+        self.content = kwargs.get('content', self.content)
+
+def make_guild(guild_id: int) -> discord.Guild:
+    guild = discord.Guild.__new__(discord.Guild)
+    guild.id = guild_id
+    return guild
+
+class LoadRobot(Robot):
+    """Module `robot` signalant la fin de chaque tour à toutes les mentions qu'il regroupe"""
+    turns = 0
+
+    async def handle_completion(self, prompt_message, *, others=(), **kwargs) -> bool:
+        try:
+            ok = await super().handle_completion(prompt_message, others=others, **kwargs)
+        except Exception:
+            ok = False
+        self.turns += 1
+        for message in (*others, prompt_message):
+            # Les mentions regroupées sont visibles dans la réponse au dernier message du tour
+            message.first_reply = message.first_reply or prompt_message.first_reply
+            if not message.done.done():
+                message.done.set_result(ok)
+        return ok
+
+# TOKENIZER HORS LIGNE -------------------------------------------------------------------
+
+class ApproxEncoding:
+    """Un token par mot, comme `openai_stub.count_tokens`"""
+    def encode(self, text: str, **kwargs) -> list[str]:
+        return text.split()
+
+    def encode_batch(self, texts: list[str], **kwargs) -> list[list[str]]:
+        return [text.split() for text in texts]
+
+class ApproxTokenizer(TokenizerService):
+    async def load(self):
+        self._encoding = ApproxEncoding() # type: ignore
+        return self._encoding
+
+# CHARGE -------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies : list[float] = []
+        self.first_tokens : list[float] = []
+        self.failures = 0
+        self.rejected = 0
+
+    def report(self, sent: int, elapsed: float, robot: LoadRobot, stub: openai_stub.StubConfig | None):
+        ok = len(self.latencies)
+        print(f"\nRequêtes envoyées : {sent} · réussies : {ok} · échouées : {self.failures} · refusées (file pleine) : {self.rejected}")
+        print(f"Débit obtenu : {ok / elapsed:.2f} complétions/s sur {elapsed:.1f}s")
+        if robot.turns:
+            print(f"Tours de complétion : {robot.turns} · {(ok + self.failures) / robot.turns:.2f} mentions par tour")
+        for label, values in (("Latence de bout en bout", self.latencies), ("Premier fragment affiché", self.first_tokens)):
+            if len(values) > 1:
+                cuts = statistics.quantiles(values, n=100, method='inclusive')
+                print(f"{label} (ms) : p50 {cuts[49] * 1000:.0f} · p95 {cuts[94] * 1000:.0f} · p99 {cuts[98] * 1000:.0f} · max {max(values) * 1000:.0f}")
+        print(f"Client OpenAI : {robot.completions.stats}")
+        if stub:
+            print(f"Serveur de test : {stub.stats}")
+
+async def run(args: argparse.Namespace):
+    stub = None
+    runner = None
+    base_url = args.base_url
+    if not base_url:
+        stub = openai_stub.config_from_args(args)
+        runner, base_url = await openai_stub.start(stub)
+    os.environ['OPENAI_BASE_URL'] = base_url
+
+    # Données du module dans un dossier temporaire (les chemins de dataio sont relatifs)
+    workdir = tempfile.mkdtemp(prefix='wandr-load-')
+    os.chdir(workdir)
+    bot = types.SimpleNamespace(config={'OPENAI_API_KEY': 'stub'}, user=FakeBotUser())
+    robot = LoadRobot(bot) # type: ignore
+    if args.approx_tokens:
+        robot.tokenizer.close()
+        robot.tokenizer = ApproxTokenizer()
+    try:
+        await robot.tokenizer.load()
+    except Exception as e:
+        print(f"Encodage tiktoken '{robot.tokenizer.encoding_name}' indisponible ({e}).\n"
+              "Le télécharger une fois en ligne (voir TIKTOKEN_CACHE_DIR) ou relancer avec --approx-tokens.", file=sys.stderr)
+        robot.tokenizer.close()
+        await robot.client.close()
+        if runner:
+            await runner.cleanup()
+        sys.exit(1)
+    await robot.cog_load()
+
+    rng = random.Random(args.seed)
+    guilds = [make_guild(1000 + i) for i in range(args.guilds)]
+    channels = [FakeChannel(2000 + i, guilds[i % len(guilds)]) for i in range(args.channels)]
+    members = [FakeMember(3000 + i, f'membre{i}', guilds[i % len(guilds)]) for i in range(args.channels * 4)]
+
+    chatbots = {}
+    for channel in channels:
+        if args.scenario == 'custom':
+            author = FakeMember(4000 + channel.id, 'auteur', channel.guild)
+            robot.create_preset(f'charge-{channel.id}', "Tu es un chatbot de test.", 0.8, author)
+            preset_id = robot.get_presets(channel.guild)[-1]['id']
+            chatbot = robot.get_preset(channel.guild, preset_id)
+        else:
+            chatbot = BaseChatbot(robot, "Tu es un chatbot de test.", 0.8, guild=channel.guild)
+        chatbots[channel.id] = chatbot
+        robot.attach_chatbot(channel, chatbot) # type: ignore
+
+    recorder = Recorder()
+
+    async def one_request():
+        channel = rng.choice(channels)
+        member = rng.choice([m for m in members if m.guild is channel.guild])
+        message = FakeMessage(channel, member, rng.choice(PROMPTS))
+        start = time.perf_counter()
+        try:
+            if args.scenario == 'handle':
+                # Même chemin que `on_message` : file du salon, mentions regroupées pendant une génération
+                if not robot.get_completion_queue(channel).submit(message): # type: ignore
+                    recorder.rejected += 1
+                    return
+                ok = await message.done
+            else:
+                async def on_update(text: str):
+                    if message.first_reply is None:
+                        message.first_reply = time.perf_counter()
+                chatbot = chatbots[channel.id]
+                completion = await chatbot.get_completion(message.content, member.name, on_update=on_update if args.stream else None)
+                ok = completion is not None
+                if chatbot.needs_summary:
+                    robot.schedule_summary(chatbot, [member]) # type: ignore
+        except Exception:
+            ok = False
+        if not ok:
+            recorder.failures += 1
+            return
+        recorder.latencies.append(time.perf_counter() - start)
+        if message.first_reply is not None:
+            recorder.first_tokens.append(message.first_reply - start)
+
+    print(f"Scénario '{args.scenario}' · {args.rate} req/s pendant {args.duration}s · {args.channels} salons sur {args.guilds} serveurs · API : {base_url}")
+    tasks = []
+    start = time.perf_counter()
+    # Arrivées régulières (boucle ouverte) : le débit cible ne dépend pas des temps de réponse
+    for i in range(int(args.rate * args.duration)):
+        delay = start + i / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one_request()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    recorder.report(len(tasks), elapsed, robot, stub)
+    await robot.cog_unload()
+    await robot.client.close()
+    if runner:
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=['chatbot', 'custom', 'handle'], default='handle')
+    parser.add_argument('--rate', type=float, default=5.0, help="Requêtes par seconde")
+    parser.add_argument('--duration', type=float, default=20.0, help="Durée d'envoi, en secondes")
+    parser.add_argument('--channels', type=int, default=4, help="Nombre de salons simulés")
+    parser.add_argument('--guilds', type=int, default=2, help="Nombre de serveurs simulés")
+    parser.add_argument('--stream', action='store_true', help="Streaming pour les scénarios chatbot/custom (handle l'utilise toujours)")
+    parser.add_argument('--approx-tokens', action='store_true', help="Compter un token par mot au lieu de charger l'encodage tiktoken (hors ligne)")
+    parser.add_argument('--base-url', default=None, help="API à utiliser au lieu du serveur de test intégré")
+    openai_stub.add_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
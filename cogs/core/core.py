@@ -144,6 +144,7 @@ class Core(commands.Cog):
         self.bot = bot
         
         self._last_result: Optional[Any] = None
+        self._commands_autocomplete = fuzzy.AutocompleteCache(key=lambda c: c.qualified_name, limit=5)
 
     # Gestion des commandes et modules ------------------------------
 
@@ -329,8 +330,11 @@ class Core(commands.Cog):
                 all_commands.extend(command.commands)
             else:
                 all_commands.append(command)
-        r = fuzzy.finder(current, all_commands, key=lambda c: c.qualified_name)
-        return [app_commands.Choice(name=c.qualified_name, value=c.qualified_name) for c in r][:5]
+        # L'arbre peut changer au (dé)chargement d'un module : la liste des noms sert de version
+        version = tuple(c.qualified_name for c in all_commands)
+        scope = (interaction.guild_id or 0, interaction.user.id, 'help')
+        r = self._commands_autocomplete.finder(scope, version, current, all_commands)
+        return [app_commands.Choice(name=c.qualified_name, value=c.qualified_name) for c in r]
 
 async def setup(bot):
     await bot.add_cog(Core(bot))
@@ -257,6 +257,11 @@ class Messages(commands.Cog):
         
         self._cooldowns : dict[int, dict[int, datetime]] = {}
         
+        # Autocomplétion des cookies : index par serveur tenu à jour à chaque modification, cache invalidé au passage
+        self._cookies_versions : dict[int, int] = {}
+        self._cookies_autocomplete = fuzzy.AutocompleteCache(key=lambda c: f"{c[0]} {c[1]}")
+        self._cookies_indexes : dict[int, fuzzy.FuzzyIndex[tuple[int, str]]] = {}
+        
     def cog_unload(self):
         self.data.close_all()
         
@@ -295,12 +300,40 @@ class Messages(commands.Cog):
             '''INSERT INTO cookies (author_id, content, created_at) VALUES (?, ?, ?)''',
             (author.id, content, datetime.now().timestamp())
         )
+        index = self._cookies_indexes.get(author.guild.id)
+        if index is not None:
+            cookie = self.data.get(author.guild).fetch('''SELECT * FROM cookies ORDER BY id DESC LIMIT 1''')
+            if cookie:
+                index.add(self._cookie_choice(cookie))
+        self._bump_cookies_version(author.guild)
         
     def delete_cookie(self, guild: discord.Guild, id: int):
+        cookie = self.get_cookie(guild, id) if guild.id in self._cookies_indexes else None
         self.data.get(guild).execute('''DELETE FROM cookies WHERE id = ?''', (id,))
+        if cookie:
+            self._cookies_indexes[guild.id].discard(self._cookie_choice(cookie))
+        self._bump_cookies_version(guild)
         
     def edit_cookie_content(self, guild: discord.Guild, id: int, content: str):
+        cookie = self.get_cookie(guild, id) if guild.id in self._cookies_indexes else None
         self.data.get(guild).execute('''UPDATE cookies SET content = ? WHERE id = ?''', (content, id))
+        if cookie:
+            self._cookies_indexes[guild.id].discard(self._cookie_choice(cookie))
+            self._cookies_indexes[guild.id].add(self._cookie_choice({'id': id, 'content': content}))
+        self._bump_cookies_version(guild)
+        
+    def _bump_cookies_version(self, guild: discord.Guild):
+        self._cookies_versions[guild.id] = self._cookies_versions.get(guild.id, 0) + 1
+        
+    def _cookie_choice(self, cookie: dict) -> tuple[int, str]:
+        return cookie['id'], pretty.shorten_text(cookie['content'], 25)
+        
+    def _get_cookies_index(self, guild: discord.Guild) -> fuzzy.FuzzyIndex[tuple[int, str]]:
+        """Index de recherche des cookies d'un serveur, construit au premier besoin"""
+        if guild.id not in self._cookies_indexes:
+            self._cookies_indexes[guild.id] = fuzzy.FuzzyIndex([self._cookie_choice(c) for c in self.get_cookies(guild)], 
+                                                               key=self._cookies_autocomplete.key)
+        return self._cookies_indexes[guild.id]
         
     def use_cookie(self, guild: discord.Guild, id: int):
         self.data.get(guild).execute('''UPDATE cookies SET uses = uses + 1 WHERE id = ?''', (id,))
@@ -432,7 +465,7 @@ class Messages(commands.Cog):
             return await interaction.followup.send("**Annulé** · La création du cookie a été annulée.", ephemeral=True)
         
         self.add_cookie(interaction.user, content)
-        rankio.get(interaction.user).add_points(10)
+        await rankio.get(interaction.user).aadd_points(10, source='fortune.submit')
         await interaction.edit_original_response(content="**Cookie ajouté** · Votre cookie de la fortune a été ajouté avec succès.\nVous gagnez **10 points de prestige (✱)** pour votre contribution !", view=None)
         
     @fortune_group.command(name="list")
@@ -525,9 +558,9 @@ class Messages(commands.Cog):
     async def autocomplete_cookie_id(self, interaction: Interaction, current: str):
         if not isinstance(interaction.guild, discord.Guild):
             return []
-        cookies = self.get_cookies(interaction.guild)
-        cookies = [(c['id'], pretty.shorten_text(c['content'], 25)) for c in cookies]
-        r = fuzzy.finder(current, cookies, key=lambda c: f"{c[0]} {c[1]}")
+        guild = interaction.guild
+        scope = (guild.id, interaction.user.id, interaction.command.qualified_name if interaction.command else None)
+        r = self._cookies_autocomplete.finder(scope, self._cookies_versions.get(guild.id, 0), current, lambda: self._get_cookies_index(guild))
         return [app_commands.Choice(name=f"{c[0]} · {c[1]}", value=c[0]) for c in r]
         
     @fortune_mod_group.command(name="guildsettings")
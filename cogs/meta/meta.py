@@ -1,15 +1,66 @@
 import logging
-from datetime import datetime, timedelta
 
 import discord
 from discord import Interaction, app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from common import rankio
 from common.utils import pretty
 
 logger = logging.getLogger(f'WANDR.{__name__.split(".")[-1]}')
 
+LEADERBOARD_PERIODS : dict[int | None, str] = {
+    1: '24h',
+    7: '7 jours',
+    30: '30 jours',
+    None: 'Total'
+}
+
+# MENUS =======================================================
+
+class LeaderboardView(discord.ui.View):
+    """Classements de prestige précalculés, avec un bouton par période."""
+    def __init__(self, pages: dict[int | None, discord.Embed], *, start_at: int | None = 7, author: discord.Member | discord.User, timeout: float = 120.0):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.current = start_at
+        self.author = author
+        
+        self.interaction : Interaction | None = None
+        
+        for period in pages:
+            button = discord.ui.Button(label=LEADERBOARD_PERIODS.get(period, f'{period} jours'), style=discord.ButtonStyle.gray)
+            button.callback = self.__switch_callback(period)
+            self.add_item(button)
+        self.handle_buttons()
+        
+    def __switch_callback(self, period: int | None):
+        async def callback(interaction: Interaction):
+            self.current = period
+            self.handle_buttons()
+            await interaction.response.edit_message(embed=self.pages[period], view=self)
+        return callback
+    
+    def handle_buttons(self):
+        for button, period in zip(self.children, self.pages):
+            if isinstance(button, discord.ui.Button):
+                button.disabled = period == self.current
+                button.style = discord.ButtonStyle.blurple if period == self.current else discord.ButtonStyle.gray
+        
+    async def interaction_check(self, interaction: Interaction):
+        if interaction.user.id == self.author.id:
+            return True
+        await interaction.response.send_message("**Pas touche !** · Seul l'auteur de la commande peut changer de classement.", ephemeral=True)
+        return False
+        
+    async def on_timeout(self):
+        if self.interaction:
+            await self.interaction.edit_original_response(view=None)
+            
+    async def start(self, interaction: Interaction):
+        await interaction.response.send_message(embed=self.pages[self.current], view=self)
+        self.interaction = interaction
+
 # COG =======================================================
 
 class Meta(commands.Cog):
@@ -24,10 +75,70 @@ class Meta(commands.Cog):
         )
         self.bot.tree.add_command(self.show_prestige)
         
-    # --- Affichage ---
+    async def cog_load(self):
+        self.downsample_rankings.start()
+        self.compact_rankings.start()
+        self.refresh_global_ranking.start()
+        
+    async def cog_unload(self):
+        self.downsample_rankings.cancel()
+        self.compact_rankings.cancel()
+        self.refresh_global_ranking.cancel()
+        
+    # --- Maintenance ---
+    
+    @tasks.loop(hours=1)
+    async def downsample_rankings(self):
+        """Replie toutes les heures les points horaires expirés en points journaliers"""
+        results = await rankio.downsample_guilds(self.bot.guilds)
+        for guild_id, count in results.items():
+            if count:
+                logger.info(f'Ranking horaire replié pour {guild_id} : {count} lignes')
+                
+    @downsample_rankings.before_loop
+    async def before_downsample_rankings(self):
+        await self.bot.wait_until_ready()
     
-    def _member_ranking_embed(self, member: discord.Member):
-        ranking = rankio.get(member)
+    @tasks.loop(hours=24)
+    async def compact_rankings(self):
+        """Replie quotidiennement les anciens points journaliers en totaux mensuels"""
+        results = await rankio.compact_guilds(self.bot.guilds)
+        for guild_id, count in results.items():
+            if count:
+                logger.info(f'Ranking compacté pour {guild_id} : {count} lignes')
+                
+    @compact_rankings.before_loop
+    async def before_compact_rankings(self):
+        await self.bot.wait_until_ready()
+        
+    @tasks.loop(minutes=10)
+    async def refresh_global_ranking(self):
+        """Reporte les nouvelles attributions de points de chaque serveur dans le classement global"""
+        count = await rankio.refresh_global(self.bot.guilds)
+        if count:
+            logger.info(f'Classement global mis à jour : {count} attributions reportées')
+            
+    @refresh_global_ranking.before_loop
+    async def before_refresh_global_ranking(self):
+        await self.bot.wait_until_ready()
+        
+    # --- Index des membres ---
+    # Seuls les classements déjà chargés sont tenus à jour : les autres liront la liste des membres à leur chargement
+    
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        if ranking := rankio.get_loaded(member.guild):
+            await ranking.aadd_member(member)
+    
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        if ranking := rankio.get_loaded(member.guild):
+            await ranking.aremove_member(member)
+
+    # --- Affichage ---
+
+    async def _member_ranking_embed(self, member: discord.Member):
+        ranking = await rankio.aget(member)
         username = f"***{member.display_name}*** ({member.name})" if member.display_name != member.name else f'***{member.name}***'
         embed = discord.Embed(
             title=username,
@@ -36,25 +147,22 @@ class Meta(commands.Cog):
         # Total
         embed.add_field(
             name='Total',
-            value=pretty.codeblock(str(ranking.get_total_points()) + '✱')
+            value=pretty.codeblock(str(await ranking.aget_total_points()) + '✱')
         )
         
         # Cumul sur 7 jours
-        points = ranking.get_cumulative_points()
+        points = await ranking.aget_cumulative_points()
         embed.add_field(
             name='Points/7j',
             value=pretty.codeblock(str(points) + '✱', lang='css')
         )
         
-        # Evolution par rapport à la veille
-        two_days_ago = datetime.now() - timedelta(days=2)
-        yesterday = datetime.now() - timedelta(days=1)
-        points_two_days_ago = ranking.get_cumulative_points(start=two_days_ago, end=yesterday)
-        points_yesterday = ranking.get_cumulative_points(start=yesterday)
-        diff = points_yesterday - points_two_days_ago
+        # Prestige décroissant (les points perdent la moitié de leur poids tous les 7 jours)
+        decayed = await ranking.aget_decayed_points()
+        rank = await ranking.aget_personal_rank(mode='decay')
         embed.add_field(
-            name='Tendance',
-            value=pretty.codeblock(f'{diff:+}', lang='diff')
+            name='Dynamique',
+            value=pretty.codeblock(f'{round(decayed)}✱' + (f' · {rank}e' if rank else ''), lang='css')
         )
 
         embed.set_thumbnail(url=member.display_avatar.url)
@@ -69,7 +177,7 @@ class Meta(commands.Cog):
         if not isinstance(interaction.user, discord.Member):
             return
         user = member or interaction.user
-        embed = self._member_ranking_embed(user)
+        embed = await self._member_ranking_embed(user)
         await interaction.response.send_message(embed=embed)
         
     @app_commands.command(name='leaderboard')
@@ -79,24 +187,47 @@ class Meta(commands.Cog):
         """Affiche le classement des membres."""
         if not isinstance(interaction.guild, discord.Guild):
             return
-        ranking = rankio.get(interaction.guild).get_top(limit=limit)
-        text = '\n'.join(f'{i+1}. ***{member.name}*** · {points}✱' for i, (member, points) in enumerate(ranking))
+        # Tous les classements sont calculés d'un coup, le changement de période ne refait aucune requête
+        guild_ranking = await rankio.aget(interaction.guild)
+        tops, own_ranks = await guild_ranking.aget_leaderboard(interaction.user, periods=list(LEADERBOARD_PERIODS), limit=limit)
+        
+        pages = {}
+        for period, ranking in tops.items():
+            text = '\n'.join(f'{i+1}. ***{member.name}*** · {points}✱' for i, (member, points) in enumerate(ranking))
+            title = 'Classement de **prestige** (total)' if period is None else f'Classement de **prestige** ({LEADERBOARD_PERIODS[period]})'
+            embed = discord.Embed(title=title, description=text or '*Aucun point sur cette période*')
+            # Classement personnel
+            if period in own_ranks:
+                embed.set_footer(text=f'Votre classement · {own_ranks[period]}e' if own_ranks[period] else 'Votre classement · Non classé')
+            embed.set_thumbnail(url=interaction.guild.icon.url if interaction.guild.icon else None)
+            pages[period] = embed
+        
+        view = LeaderboardView(pages, start_at=7, author=interaction.user)
+        await view.start(interaction)
+        
+    @app_commands.command(name='globalboard')
+    @app_commands.rename(limit='limite')
+    async def command_global_leaderboard(self, interaction: Interaction, limit: app_commands.Range[int, 1, 30] = 10):
+        """Affiche le classement de prestige tous serveurs confondus."""
+        glob = rankio.get_global()
+        lines = []
+        for i, (user_id, points) in enumerate(await glob.aget_top(limit=limit)):
+            user = self.bot.get_user(user_id)
+            name = user.name if user else f'ID:{user_id}'
+            lines.append(f'{i+1}. ***{name}*** · {points}✱')
         embed = discord.Embed(
-            title='Classement de **prestige** (7 derniers jours)',
-            description=text
+            title='Classement **global** de prestige',
+            description='\n'.join(lines) or '*Aucun point enregistré*'
         )
         # Classement personnel
-        if isinstance(interaction.user, discord.Member):
-            own_rank = rankio.get(interaction.user).get_personal_rank()
-            embed.set_footer(text=f'Votre classement · {own_rank}e')
-        
-        embed.set_thumbnail(url=interaction.guild.icon.url if interaction.guild.icon else None)
+        own_rank = await glob.aget_rank(interaction.user)
+        embed.set_footer(text=f'Votre classement · {own_rank}e ({await glob.aget_points(interaction.user)}✱)' if own_rank else 'Votre classement · Non classé')
         await interaction.response.send_message(embed=embed)
         
     # CALLBACKS ==============================================
     
     async def callback_show_prestige(self, interaction: Interaction, member: discord.Member):
-        embed = self._member_ranking_embed(member)
+        embed = await self._member_ranking_embed(member)
         await interaction.response.send_message(embed=embed, ephemeral=True)
         
 async def setup(bot):
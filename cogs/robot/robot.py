@@ -1,9 +1,16 @@
 import asyncio
+import contextlib
+import hashlib
+import json
 import logging
+import random
 import re
-from typing import Iterable
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Sequence
 import unidecode
-from openai import AsyncOpenAI
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, InternalServerError, RateLimitError
 from datetime import datetime, timedelta
 
 import discord
@@ -16,6 +23,73 @@ from common.utils import fuzzy, pretty, interface
 
 logger = logging.getLogger(f'WANDR.{__name__.split(".")[-1]}')
 MAX_COMPLETION_TOKENS : int = 250
+STREAM_EDIT_INTERVAL : float = 1.5 # Secondes entre deux éditions d'une réponse en streaming (limites de Discord)
+COMPLETION_QUEUE_SIZE : int = 5 # Mentions en attente par salon pendant une génération
+CONTEXT_TOKEN_LIMIT : int = 1000
+RESPONSE_CACHE_SIZE : int = 256
+RESPONSE_CACHE_TTL : float = 900 # Secondes
+RESPONSE_CACHE_MAX_TEMPERATURE : float = 0.5 # Au-delà, les réponses sont trop variables pour être réutilisées
+SUMMARY_KEEP_TOKENS : int = 300 # Échanges récents conservés tels quels après un résumé
+SUMMARY_MAX_TOKENS : int = 200
+SUMMARY_MARGIN_TOKENS : int = 50 # Préfixe du résumé et surcoût des messages dans le contexte (voir `BaseChatbot.summary_trigger_tokens`)
+SUMMARY_RETRY_DELAY : float = 300 # Secondes avant un nouvel essai après un résumé raté
+SUMMARY_INSTRUCTIONS : str = (
+    "Tu résumes une conversation entre des utilisateurs et un assistant. "
+    "Fusionne le résumé précédent (s'il existe) et les nouveaux échanges en un résumé unique, concis et factuel, "
+    "à la troisième personne. Conserve ce qui reste utile pour la suite : noms, préférences, faits, décisions et questions en suspens. "
+    "Réponds uniquement avec le résumé."
+)
+
+# TOKENIZER ---------------------------------------------------------------------
+
+class TokenizerService:
+    """Encodage tiktoken partagé par le module, exécuté hors de la boucle d'évènements
+    
+    L'encodage est chargé une seule fois (au chargement du module) dans un thread, et les comptes de tokens
+    sont calculés par lots dans un pool de threads dédié."""
+    def __init__(self, encoding_name: str = 'cl100k_base', *, max_workers: int = 2):
+        self.encoding_name = encoding_name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tokenizer')
+        self._encoding : tiktoken.Encoding | None = None
+        self._loading : asyncio.Future[tiktoken.Encoding] | None = None
+        
+    async def load(self) -> tiktoken.Encoding:
+        """Charge l'encodage dans un thread (une seule fois, même en cas d'appels concurrents)"""
+        if self._encoding is None:
+            if self._loading is None:
+                self._loading = asyncio.get_running_loop().run_in_executor(self._executor, tiktoken.get_encoding, self.encoding_name)
+            try:
+                self._encoding = await self._loading
+            except Exception:
+                self._loading = None # Nouvel essai au prochain appel
+                raise
+        return self._encoding
+    
+    async def count_tokens(self, text: str) -> int:
+        """Compte les tokens d'un texte"""
+        return (await self.count_tokens_batch([text]))[0]
+    
+    async def count_tokens_batch(self, texts: Sequence[str]) -> list[int]:
+        """Compte les tokens de plusieurs textes en un seul passage dans le pool"""
+        if not texts:
+            return []
+        encoding = await self.load()
+        # Les tokens spéciaux écrits par les utilisateurs sont comptés comme du texte ordinaire
+        encoded = await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: encoding.encode_batch(list(texts), num_threads=1, disallowed_special=())
+        )
+        return [len(tokens) for tokens in encoded]
+    
+    def count(self, text: str) -> int:
+        """Version synchrone, pour les rares appelants qui ne peuvent pas attendre
+        
+        Ne charge jamais l'encodage (téléchargement possible) depuis la boucle d'évènements : il doit l'être déjà"""
+        if self._encoding is None:
+            raise RuntimeError(f"Encodage '{self.encoding_name}' non chargé")
+        return len(self._encoding.encode(text, disallowed_special=()))
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 # UI ---------------------------------------------------------------------
 
@@ -132,38 +206,443 @@ class CreateChatbotModal(discord.ui.Modal):
             return await interaction.followup.send("**Erreur** · La température doit être un nombre entre 0.1 et 2.0.", ephemeral=True)
         
         system_prompt = self.system_prompt.value
-        system_tokens = tiktoken.get_encoding('cl100k_base').encode(system_prompt)
-        if len(system_tokens) > MAX_COMPLETION_TOKENS // 2:
+        if await self._cog.tokenizer.count_tokens(system_prompt) > MAX_COMPLETION_TOKENS // 2:
             return await interaction.followup.send(f"**Instructions trop longues** · Les instructions ne doivent pas dépasser {MAX_COMPLETION_TOKENS // 2} tokens (soit environ {MAX_COMPLETION_TOKENS // 2 * 2} caractères).", ephemeral=True)
         
-        self._cog.attach_chatbot(self.channel, BaseChatbot(self._cog, system_prompt, temperature))
+        self._cog.attach_chatbot(self.channel, BaseChatbot(self._cog, system_prompt, temperature, guild=self.channel.guild))
         await interaction.followup.send("Le chatbot temporaire a été créé avec succès.", ephemeral=True)
         self.stop()
         
     async def on_timeout(self) -> None:
         self.stop()
 
+# API ---------------------------------------------------------------------
+
+class TokenBucket:
+    """Seau à jetons rempli de `per_minute` unités par minute, avec une réserve d'au plus une minute"""
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self._rate = per_minute / 60
+        self._level = per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        
+    async def acquire(self, amount: float = 1):
+        """Attend que `amount` unités soient disponibles puis les consomme (dans l'ordre d'arrivée)"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self._rate)
+
+class CompletionClient:
+    """Accès partagé à l'API de complétion d'OpenAI
+    
+    Les requêtes sont limitées par des seaux à jetons en requêtes et en tokens par minute, puis par un sémaphore
+    global et un par serveur (`queued` compte les requêtes qui attendent l'un ou l'autre). Les erreurs temporaires (429, 5xx, délais dépassés) sont retentées
+    avec un délai exponentiel aléatoire, qui respecte l'en-tête `retry-after` lorsqu'il est fourni."""
+    def __init__(self, client: AsyncOpenAI, *, 
+                 max_concurrency: int = 8, 
+                 guild_concurrency: int = 2, 
+                 requests_per_minute: int = 500, 
+                 tokens_per_minute: int = 80_000,
+                 max_retries: int = 4,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0):
+        self.client = client
+        self.guild_concurrency = guild_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._guild_semaphores : dict[int, tuple[asyncio.Semaphore, int]] = {} # Sémaphore et nombre de requêtes qui l'utilisent
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        
+        self.in_flight = 0
+        self.queued = 0
+        self.retried = 0
+        self.failed = 0
+        
+    @property
+    def stats(self) -> dict[str, int]:
+        return {'in_flight': self.in_flight, 'queued': self.queued, 'retried': self.retried, 'failed': self.failed}
+    
+    def _guild_semaphore(self, guild_id: int | None) -> asyncio.Semaphore | None:
+        if guild_id is None:
+            return None
+        semaphore, users = self._guild_semaphores.get(guild_id, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.guild_concurrency)
+        self._guild_semaphores[guild_id] = (semaphore, users + 1)
+        return semaphore
+    
+    def _release_guild_semaphore(self, guild_id: int | None):
+        # Supprimé dès qu'aucune requête ne l'utilise ni ne l'attend
+        if guild_id is None:
+            return
+        semaphore, users = self._guild_semaphores[guild_id]
+        if users > 1:
+            self._guild_semaphores[guild_id] = (semaphore, users - 1)
+        else:
+            del self._guild_semaphores[guild_id]
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """Délai avant un nouvel essai, ou None si l'erreur n'est pas temporaire"""
+        if isinstance(error, RateLimitError) and getattr(error, 'code', None) == 'insufficient_quota':
+            return None
+        if not isinstance(error, RateLimitError | InternalServerError | APIConnectionError):
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if isinstance(error, APIStatusError):
+            headers = error.response.headers
+            try:
+                if 'retry-after-ms' in headers:
+                    delay = max(delay, float(headers['retry-after-ms']) / 1000)
+                elif 'retry-after' in headers:
+                    delay = max(delay, float(headers['retry-after']))
+            except ValueError: # Date HTTP : on garde le délai exponentiel
+                pass
+        return delay
+    
+    async def _throttle(self, estimated_tokens: int):
+        """Attend que la requête tienne dans les limites par minute"""
+        self.queued += 1
+        try:
+            await self._requests.acquire()
+            await self._tokens.acquire(estimated_tokens)
+        finally:
+            self.queued -= 1
+    
+    @contextlib.asynccontextmanager
+    async def _slot(self, guild_id: int | None):
+        """Réserve une place dans la limite du serveur puis dans la limite globale"""
+        guild_semaphore = self._guild_semaphore(guild_id)
+        self.queued += 1
+        try:
+            if guild_semaphore:
+                await guild_semaphore.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                if guild_semaphore:
+                    guild_semaphore.release()
+                raise
+        except BaseException:
+            self._release_guild_semaphore(guild_id)
+            raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            if guild_semaphore:
+                guild_semaphore.release()
+            self._release_guild_semaphore(guild_id)
+    
+    @contextlib.asynccontextmanager
+    async def _request(self, guild_id: int | None, estimated_tokens: int, kwargs: dict[str, Any]) -> AsyncIterator[Any]:
+        """Envoie la requête dans les limites par minute et de concurrence, avec nouvelles tentatives
+        
+        Les places ne sont réservées que le temps de chaque essai, puis jusqu'à la sortie du bloc une fois la réponse obtenue :
+        les attentes (seaux à jetons, délai avant un nouvel essai) ne bloquent pas les autres requêtes."""
+        attempt = 0
+        while True:
+            await self._throttle(estimated_tokens)
+            async with self._slot(guild_id):
+                try:
+                    response = await self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt) if attempt < self.max_retries else None
+                    if delay is None:
+                        self.failed += 1
+                        raise
+                    logger.warning(f"Erreur OpenAI temporaire ({type(e).__name__}), nouvel essai dans {delay:.1f}s")
+                    self.retried += 1
+                    attempt += 1
+                else:
+                    yield response
+                    return
+            await asyncio.sleep(delay)
+    
+    async def create(self, *, guild_id: int | None = None, estimated_tokens: int = 0, **kwargs) -> Any:
+        """Équivalent de `client.chat.completions.create` (sans streaming)
+        
+        :param guild_id: Serveur à l'origine de la requête, pour la limite par serveur
+        :param estimated_tokens: Tokens que la requête consommera au plus (contexte et réponse), pour la limite par minute"""
+        async with self._request(guild_id, estimated_tokens, kwargs) as completion:
+            return completion
+            
+    async def stream(self, *, guild_id: int | None = None, estimated_tokens: int = 0, **kwargs) -> AsyncIterator[Any]:
+        """Comme `create` avec `stream=True`, en renvoyant directement les fragments
+        
+        Les places restent occupées jusqu'à la fin du streaming ; seule l'ouverture du flux est retentée.
+        Le générateur doit être fermé par l'appelant s'il s'arrête avant la fin (voir `contextlib.aclosing`)."""
+        async with self._request(guild_id, estimated_tokens, {**kwargs, 'stream': True}) as stream:
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                # Arrêt anticipé (erreur de l'appelant, annulation) : la connexion est rendue avant les places
+                await stream.close()
+
+class ResponseCache:
+    """Cache des réponses identiques, pour les chatbots peu créatifs (température basse)
+    
+    Une réponse est réutilisée lorsque le même chatbot, à la même température, reçoit exactement le même contexte.
+    Les entrées sont évincées par ancienneté d'utilisation (LRU) et expirent après `ttl` secondes."""
+    def __init__(self, *, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL, max_temperature: float = RESPONSE_CACHE_MAX_TEMPERATURE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self._entries : OrderedDict[tuple[int, float, str], tuple[float, dict[str, Any]]] = OrderedDict()
+        
+        self.lookups = 0
+        self.hits = 0
+        self.tokens_saved = 0
+        
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+        
+    def eligible(self, temperature: float) -> bool:
+        return self.max_entries > 0 and temperature <= self.max_temperature
+    
+    def key(self, preset_id: int, temperature: float, context: Iterable[dict[str, str]]) -> tuple[int, float, str]:
+        digest = hashlib.sha256(json.dumps(list(context), ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+        return preset_id, temperature, digest
+    
+    def get(self, key: tuple[int, float, str]) -> dict[str, Any] | None:
+        """Renvoie la réponse en cache (réponse, raison de fin, tokens consommés à l'origine) si elle n'a pas expiré"""
+        self.lookups += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.tokens_saved += entry[1]['usage']
+        return entry[1]
+    
+    def set(self, key: tuple[int, float, str], value: dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            
+    def clear(self):
+        self._entries.clear()
+
+# STREAMING ---------------------------------------------------------------------
+
+class StreamingReply:
+    """Réponse à un message publiée dès le premier fragment généré, puis éditée à intervalle régulier
+    
+    Les fragments reçus entre deux éditions sont regroupés : le message n'est jamais édité plus d'une fois
+    par `interval` secondes, quel que soit le débit du streaming."""
+    def __init__(self, prompt_message: discord.Message, prefix: str = '', *, interval: float = STREAM_EDIT_INTERVAL):
+        self.prompt_message = prompt_message
+        self.prefix = prefix
+        self.interval = interval
+        
+        self.message : discord.Message | None = None
+        self.text = ''
+        self._shown = ''
+        self._done = asyncio.Event()
+        self._flusher : asyncio.Task | None = None
+        
+    def _content(self, text: str, *, partial: bool = False) -> str:
+        content = self.prefix + text
+        if partial:
+            return content[:1998] + ' …'
+        return content[:2000]
+        
+    async def update(self, text: str):
+        """Reçoit le texte généré jusqu'ici"""
+        self.text = text
+        if self.message is None:
+            self.message = await self.prompt_message.reply(self._content(text, partial=True),
+                                                           mention_author=False,
+                                                           suppress_embeds=True,
+                                                           allowed_mentions=discord.AllowedMentions(users=False, roles=False, everyone=False, replied_user=True))
+            self._shown = text
+            self._flusher = asyncio.create_task(self.__flush_loop())
+            
+    async def __flush_loop(self):
+        while not self._done.is_set():
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._done.is_set() or not self.message or self.text == self._shown:
+                continue
+            text = self.text
+            try:
+                await self.message.edit(content=self._content(text, partial=True))
+            except discord.HTTPException as e:
+                logger.warning(f"Édition de la réponse en streaming impossible : {e}")
+            self._shown = text
+            
+    async def finish(self, text: str, **kwargs) -> discord.Message:
+        """Affiche le texte final (en publiant la réponse si aucun fragment n'a été reçu)"""
+        self._done.set()
+        if self._flusher:
+            await self._flusher
+        if self.message is None:
+            self.message = await self.prompt_message.reply(self._content(text),
+                                                           mention_author=False,
+                                                           suppress_embeds=True,
+                                                           allowed_mentions=discord.AllowedMentions(users=False, roles=False, everyone=False, replied_user=True),
+                                                           **kwargs)
+        else:
+            await self.message.edit(content=self._content(text), **kwargs)
+        return self.message
+
+# FILE D'ATTENTE ---------------------------------------------------------------------
+
+class CompletionQueue:
+    """File des complétions d'un salon : une seule génération à la fois
+    
+    Les mentions reçues pendant une génération sont regroupées en un seul tour multi-utilisateurs, traité
+    dès que la génération en cours se termine. Les générations demandées par commande (`/ask`) passent par la même file,
+    chacune comme un tour à part. La file est bornée à `maxsize` demandes en attente."""
+    def __init__(self, cog: 'Robot', channel_id: int, *, maxsize: int = COMPLETION_QUEUE_SIZE):
+        self._cog = cog
+        self.channel_id = channel_id
+        self.maxsize = maxsize
+        
+        self._pending : list[discord.Message] = []
+        self._continuations : list[discord.Message] = []
+        self._calls : list[tuple[Callable[[], Awaitable[Any]], asyncio.Future]] = []
+        self._worker : asyncio.Task | None = None
+        
+    @property
+    def busy(self) -> bool:
+        return self._worker is not None
+        
+    def submit(self, message: discord.Message) -> bool:
+        """Ajoute une mention à la file
+        
+        :return: False si la file est pleine"""
+        if len(self._pending) + len(self._calls) >= self.maxsize:
+            return False
+        self._pending.append(message)
+        self.__start()
+        return True
+    
+    def submit_call(self, func: Callable[[], Awaitable[Any]]) -> asyncio.Future | None:
+        """Ajoute une génération demandée hors mention (ex. commande `/ask`), exécutée à son tour par la file
+        
+        :param func: Fonction lançant la génération
+        :return: Future recevant le résultat de `func`, ou None si la file est pleine"""
+        if len(self._pending) + len(self._calls) >= self.maxsize:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._calls.append((func, future))
+        self.__start()
+        return future
+    
+    def submit_continuation(self, message: discord.Message):
+        """Demande la suite d'une réponse tronquée (prioritaire sur les mentions en attente)"""
+        self._continuations.append(message)
+        self.__start()
+        
+    def __start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self.__run())
+            
+    async def __run(self):
+        try:
+            while self._continuations or self._calls or self._pending:
+                try:
+                    if self._continuations:
+                        await self._cog.handle_completion(self._continuations.pop(0), _continue_completion=True)
+                    elif self._calls:
+                        func, future = self._calls.pop(0)
+                        if future.done(): # Demande abandonnée entre-temps
+                            continue
+                        try:
+                            result = await func()
+                        except Exception as e:
+                            if not future.done():
+                                future.set_exception(e)
+                        else:
+                            if not future.done():
+                                future.set_result(result)
+                        finally:
+                            if not future.done(): # Génération interrompue
+                                future.cancel()
+                    else:
+                        batch, self._pending = self._pending, []
+                        await self._cog.handle_completion(batch[-1], others=batch[:-1])
+                except Exception as e:
+                    logger.error(f"Erreur de complétion dans le salon {self.channel_id} : {e}", exc_info=True)
+        finally:
+            self._worker = None
+            self._cog._release_completion_queue(self)
+
 # CHATBOTS ---------------------------------------------------------------------
 
+def _history_tokens(messages: Iterable[dict]) -> int:
+    # Les messages système ne font pas partie de l'historique envoyé (voir `_select_context`), ceux pas encore comptés sont ajoutés une fois comptés
+    return sum(m['tokens'] for m in messages if m['role'] != 'system' and m['tokens'] is not None)
+
 class BaseChatbot:
     """Représente un chatbot de base exploitant GPT-3.5"""
-    def __init__(self, cog: 'Robot', system_prompt: str, temperature: float = 0.8):
+    preset_id : int = 0 # Chatbot temporaire
+    
+    def __init__(self, cog: 'Robot', system_prompt: str, temperature: float = 0.8, *, guild: discord.Guild | None = None):
         self.__cog = cog
         self.system_prompt = system_prompt
         self.temperature = temperature
+        self.guild_id = guild.id if guild else None
         
         self._messages = []
-        
-    def add_message(self, role: str, content: str, username: str, preset_id: int = 0):
-        self._messages.append({
+        self._history_tokens = 0 # Tokens des messages de l'historique, tenus à jour à chaque ajout ou retrait
+        self._uncounted : list[dict] = [] # Messages chargés sans compte de tokens, comptés à la prochaine complétion
+        self.__system_tokens : tuple[str, int] | None = None
+        
+        # Résumé des échanges les plus anciens, utilisé à la place des messages qu'il remplace
+        self.summary : str | None = None
+        self.summary_tokens : int | None = 0 # None : à compter à la prochaine complétion
+        self._summarizing = False
+        self._summary_retry_at = 0.0
+        
+    def add_message(self, role: str, content: str, username: str, preset_id: int = 0, tokens: int | None = None) -> dict:
+        """Ajoute un message à l'historique
+        
+        :param tokens: Nombre de tokens du contenu, calculé s'il n'est pas fourni
+        :return: Message ajouté"""
+        message = {
             'preset_id': preset_id,
             'timestamp': datetime.now().timestamp(),
             'role': role,
             'content': content,
-            'username': username
-        })
+            'username': username,
+            'tokens': tokens if tokens is not None else self.__cog.tokenizer.count(content)
+        }
+        self._messages.append(message)
+        self._history_tokens += _history_tokens([message])
+        return message
         
     def remove_message(self, index: int):
+        message = self._messages[index]
+        self._history_tokens -= _history_tokens([message])
+        self._uncounted = [m for m in self._uncounted if m is not message]
         del self._messages[index]
         
     def get_messages(self) -> list[dict]:
@@ -180,63 +659,257 @@ class BaseChatbot:
                 sanitized.append({'role': message['role'], 'content': message['content']})
         return sanitized
     
-    def get_context(self, token_limit: int = 1000) -> Iterable[dict[str, str]]:
+    @property
+    def system_tokens(self) -> int:
+        """Nombre de tokens des instructions, recalculé seulement si elles changent"""
+        prompt = str(self.system_prompt)
+        if self.__system_tokens is None or self.__system_tokens[0] != prompt:
+            self.__system_tokens = (prompt, self.__cog.tokenizer.count(prompt))
+        return self.__system_tokens[1]
+    
+    def get_context(self, token_limit: int = CONTEXT_TOKEN_LIMIT) -> Iterable[dict[str, str]]:
         """Renvoie le contexte du chatbot pour une limite de jetons donnée"""
-        tokenizer = tiktoken.get_encoding('cl100k_base')
+        return self._select_context(token_limit)[0]
+    
+    def _select_context(self, token_limit: int = CONTEXT_TOKEN_LIMIT) -> tuple[Iterable[dict[str, str]], int]:
+        """Renvoie le contexte du chatbot et son nombre de tokens
+        
+        Les tokens de chaque message étant comptés à l'ajout, l'historique est remonté depuis la fin
+        en cumulant ces comptes : seuls les messages retenus (et le premier qui dépasse) sont parcourus."""
         system = [{'role': 'system', 'content': self.system_prompt}]
+        size = self.system_tokens
+        if self.summary:
+            system.append({'role': 'system', 'content': f"Résumé des échanges précédents : {self.summary}"})
+            size += self.summary_tokens
         if not self._messages:
-            return system
+            return system, size
         context = []
-        context_size = len(tokenizer.encode(str(self.system_prompt)))
-        for message in self._messages[::-1]:
+        context_size = size
+        for message in reversed(self._messages):
             if message['role'] == 'system':
                 continue
-            if len(tokenizer.encode(message['content'])) + context_size > token_limit:
+            context_size += message['tokens']
+            if context_size > token_limit:
                 break
             context.append(message)
-            context_size += len(tokenizer.encode(message['content']))
+            size = context_size
         if context:
             context = system + context[::-1]
         else: # On ajoute que le dernier message (pour être certain que le prompt soit transmis)
             context = system + [self._messages[-1]]
-        return self._sanitize_messages(context)
+            size += self._messages[-1]['tokens']
+        return self._sanitize_messages(context), size
     
     # --- Génération de texte ---
     
-    async def get_completion(self, prompt: str, username: str = 'user') -> dict[str, str] | None:
-        """Génère une réponse à partir d'un prompt donné"""
-        if username:
-            username = ''.join([c for c in unidecode.unidecode(username) if c.isalnum() or c.isspace()]).rstrip()
+    async def get_completion(self, prompt: str, username: str = 'user', *, on_update: Callable[[str], Awaitable[None]] | None = None) -> dict[str, str] | None:
+        """Génère une réponse à partir d'un prompt donné
+        
+        :param on_update: Active le streaming : reçoit le texte déjà généré à chaque nouveau fragment"""
+        return await self.get_turn_completion([(prompt, username)], on_update=on_update)
+    
+    async def get_turn_completion(self, prompts: Sequence[tuple[str, str]], *, on_update: Callable[[str], Awaitable[None]] | None = None) -> dict[str, str] | None:
+        """Génère une seule réponse à un tour de parole pouvant regrouper les messages de plusieurs utilisateurs
+        
+        :param prompts: Messages du tour, sous la forme (contenu, nom d'utilisateur), dans l'ordre d'arrivée
+        :param on_update: Active le streaming : reçoit le texte déjà généré à chaque nouveau fragment"""
+        if not prompts:
+            return None
+        
+        prompt_tokens = await self._count_tokens([p for p, _ in prompts])
         
-        self.add_message('user', prompt, username)
-        context = self.get_context()
+        for (prompt, username), tokens in zip(prompts, prompt_tokens):
+            if username:
+                username = ''.join([c for c in unidecode.unidecode(username) if c.isalnum() or c.isspace()]).rstrip()
+            self.add_message('user', prompt, username, tokens=tokens)
+        context, context_tokens = self._select_context()
         if not context:
             return None
         
-        client = self.__cog.client
+        request = {
+            'model': "gpt-3.5-turbo",
+            'messages': context,
+            'max_tokens': MAX_COMPLETION_TOKENS,
+            'temperature': self.temperature,
+            # Limites de l'API : par serveur, et en tokens par minute (contexte + réponse au plus)
+            'guild_id': self.guild_id,
+            'estimated_tokens': context_tokens + MAX_COMPLETION_TOKENS
+        }
+        # Réponse déjà générée pour ce même contexte (chatbots à basse température uniquement)
+        cache = self.__cog.response_cache
+        cache_key = cache.key(self.preset_id, self.temperature, context) if cache.eligible(self.temperature) else None
+        cached = cache.get(cache_key) if cache_key else None
         try:
-            completion = await client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=context, # type: ignore
-                max_tokens=MAX_COMPLETION_TOKENS,
-                temperature=self.temperature
-            )
+            if cached:
+                response, finish_reason, usage = cached['response'], cached['finish_reason'], None
+                if on_update:
+                    await on_update(response)
+            elif on_update:
+                response, finish_reason, usage = await self._stream_completion(request, on_update)
+            else:
+                completion = await self.__cog.completions.create(**request)
+                response = completion.choices[0].message.content if completion.choices else None
+                finish_reason = completion.choices[0].finish_reason if completion.choices else None
+                usage = completion.usage.total_tokens if completion.usage else None
         except Exception as e:
             logger.error(f"Erreur OpenAI : {e}", exc_info=True)
             return None
         
         payload = {}
-        response = completion.choices[0].message.content if completion.choices else None
         if response:
-            self.add_message('assistant', response, 'assistant')
+            response_tokens = await self.__cog.tokenizer.count_tokens(response)
+            self.add_message('assistant', response, 'assistant', tokens=response_tokens)
+            if cache_key and not cached:
+                cache.set(cache_key, {'response': response, 'finish_reason': finish_reason, 'usage': usage or context_tokens + response_tokens})
             payload['response'] = response
-            payload['finish_reason'] = completion.choices[0].finish_reason
+            payload['finish_reason'] = finish_reason
         else:
             return None
-        if completion.usage:
-            payload['usage'] = completion.usage.total_tokens
+        if usage:
+            payload['usage'] = usage
         return payload
     
+    async def _count_tokens(self, texts: list[str]) -> list[int]:
+        """Compte les prompts dans le pool du tokenizer, en un seul lot avec tout ce qui n'a pas encore de compte
+        (instructions modifiées, anciens messages, résumé) : get_context n'encode plus rien
+        
+        :return: Tokens de chaque prompt"""
+        system_prompt = str(self.system_prompt)
+        pending = self._uncounted
+        texts = texts + [m['content'] for m in pending]
+        count_system = self.__system_tokens is None or self.__system_tokens[0] != system_prompt
+        if count_system:
+            texts.append(system_prompt)
+        count_summary = bool(self.summary) and self.summary_tokens is None
+        if count_summary:
+            texts.append(str(self.summary))
+        
+        counts = await self.__cog.tokenizer.count_tokens_batch(texts)
+        if count_summary:
+            self.summary_tokens = counts.pop()
+        if count_system:
+            self.__system_tokens = (system_prompt, counts.pop())
+        if pending:
+            for message, tokens in zip(pending, counts[-len(pending):]):
+                message['tokens'] = tokens
+            del counts[-len(pending):]
+            self._uncounted = []
+            self._history_tokens += _history_tokens(pending)
+            self._save_token_counts(pending)
+        return counts
+    
+    def _save_token_counts(self, messages: list[dict]):
+        """Enregistre les comptes de tokens calculés après coup (rien à conserver pour un chatbot temporaire)"""
+        pass
+    
+    async def _stream_completion(self, request: dict[str, Any], on_update: Callable[[str], Awaitable[None]]) -> tuple[str, str | None, int | None]:
+        """Génère une réponse en streaming
+        
+        :return: Texte complet, raison de fin et tokens consommés (envoyés par OpenAI dans le dernier fragment)"""
+        parts = []
+        finish_reason = None
+        usage = None
+        # Fermé même si `on_update` lève une erreur : le flux et les places de CompletionClient sont libérés aussitôt
+        async with contextlib.aclosing(self.__cog.completions.stream(**request, stream_options={'include_usage': True})) as stream:
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage.total_tokens
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    parts.append(choice.delta.content)
+                    await on_update(''.join(parts))
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+        return ''.join(parts), finish_reason, usage
+    
+    # --- Résumé ---
+    
+    @property
+    def history_tokens(self) -> int:
+        """Nombre de tokens des messages de l'historique (hors résumé)"""
+        return self._history_tokens
+    
+    @property
+    def summary_trigger_tokens(self) -> int:
+        """Historique à partir duquel les plus anciens échanges sont résumés : ce qui reste du contexte une fois comptés
+        les instructions et un résumé de taille maximale"""
+        return max(SUMMARY_KEEP_TOKENS, CONTEXT_TOKEN_LIMIT - self.system_tokens - SUMMARY_MAX_TOKENS - SUMMARY_MARGIN_TOKENS)
+    
+    @property
+    def needs_summary(self) -> bool:
+        """Indique si l'historique est assez long pour que ses plus anciens échanges soient résumés (hors délai après un échec)"""
+        if self._summarizing or time.monotonic() < self._summary_retry_at:
+            return False
+        return self.history_tokens > self.summary_trigger_tokens
+    
+    def defer_summary(self):
+        """Repousse le prochain résumé de `SUMMARY_RETRY_DELAY` secondes (après un échec)"""
+        self._summary_retry_at = time.monotonic() + SUMMARY_RETRY_DELAY
+    
+    async def summarize(self) -> int:
+        """Condense les plus anciens échanges dans le résumé de la conversation
+        
+        Seuls les échanges les plus récents (jusqu'à `SUMMARY_KEEP_TOKENS`) sont conservés tels quels, le reste est fusionné
+        avec le résumé précédent puis retiré de l'historique.
+        
+        :return: Tokens consommés par la requête de résumé (0 si aucune requête n'a été envoyée)"""
+        remaining = self.history_tokens
+        if remaining <= self.summary_trigger_tokens:
+            return 0
+        folded = []
+        for message in self._messages:
+            if remaining <= SUMMARY_KEEP_TOKENS:
+                break
+            folded.append(message)
+            if message['role'] != 'system':
+                remaining -= message['tokens']
+        
+        lines = []
+        for message in folded:
+            if message['role'] == 'user':
+                lines.append(f"{message['username'] or 'utilisateur'} : {message['content']}")
+            elif message['role'] == 'assistant':
+                lines.append(f"assistant : {message['content']}")
+        if not lines:
+            return 0
+        messages = [{'role': 'system', 'content': SUMMARY_INSTRUCTIONS}]
+        if self.summary:
+            messages.append({'role': 'user', 'content': f"Résumé précédent :\n{self.summary}"})
+        messages.append({'role': 'user', 'content': "Nouveaux échanges :\n" + '\n'.join(lines)})
+        
+        completion = await self.__cog.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=SUMMARY_MAX_TOKENS,
+            temperature=0.3,
+            guild_id=self.guild_id,
+            estimated_tokens=(self.summary_tokens or 0) + sum(m['tokens'] for m in folded) + 2 * SUMMARY_MAX_TOKENS
+        )
+        usage = completion.usage.total_tokens if completion.usage else 0
+        summary = completion.choices[0].message.content if completion.choices else None
+        if not summary:
+            self.defer_summary()
+            return usage
+        # L'historique a pu être effacé ou modifié pendant la génération : le résumé ne correspond plus
+        if len(self._messages) < len(folded) or any(a is not b for a, b in zip(self._messages, folded)):
+            return usage
+        tokens = await self.__cog.tokenizer.count_tokens(summary)
+        self._store_summary(summary, tokens, folded)
+        return usage
+    
+    def _store_summary(self, summary: str, tokens: int, folded: list[dict]):
+        """Remplace les messages résumés par le nouveau résumé"""
+        self.summary = summary
+        self.summary_tokens = tokens
+        del self._messages[:len(folded)]
+        self._history_tokens -= _history_tokens(folded)
+    
+    def clear_summary(self):
+        self.summary = None
+        self.summary_tokens = 0
+    
     
 class CustomChatbot(BaseChatbot):
     """Représente un chatbot personnalisé exploitant GPT-3.5"""
@@ -245,6 +918,7 @@ class CustomChatbot(BaseChatbot):
         self.guild = guild
         self.preset_id = preset_id
         
+        cog.migrate_tables(guild)
         self.data = cog.data.get(guild).fetch("SELECT * FROM presets WHERE id = ?", (preset_id,))
         if not self.data:
             raise ValueError(f"Préréglage '#{preset_id}' introuvable pour '{guild}'")
@@ -253,21 +927,35 @@ class CustomChatbot(BaseChatbot):
         
         self.name = self.data['name']
         
-        super().__init__(cog, self.system_prompt, self.temperature)
+        super().__init__(cog, self.system_prompt, self.temperature, guild=guild)
         
         self._messages = self.__load_messages()
+        self._history_tokens = _history_tokens(self._messages)
+        # Messages enregistrés avant le stockage des tokens : comptés une seule fois à la prochaine complétion puis sauvegardés
+        self._uncounted = [m for m in self._messages if m['tokens'] is None]
+        if self.data['summary']:
+            self.summary = self.data['summary']
+            self.summary_tokens = self.data['summary_tokens']
         
     def __load_messages(self) -> list[dict]:
         self.cleanup_messages_before(datetime.now() - timedelta(days=7))
         r = self.__cog.data.get(self.guild).fetch_all("SELECT * FROM messages WHERE preset_id = ? ORDER BY timestamp ASC", (self.preset_id,))
-        return r if r else []
+        return [dict(m) for m in r] if r else []
+    
+    def _save_token_counts(self, messages: list[dict]):
+        self.__cog.data.get(self.guild).execute_many(
+            "UPDATE messages SET tokens = ? WHERE preset_id = ? AND timestamp = ?",
+            [(m['tokens'], self.preset_id, m['timestamp']) for m in messages]
+        )
         
-    def add_message(self, role: str, content: str, username: str):
+    def add_message(self, role: str, content: str, username: str, tokens: int | None = None) -> dict:
+        message = super().add_message(role, content, username, self.preset_id, tokens)
+        # Même horodatage qu'en mémoire, pour pouvoir retrouver le message en base
         self.__cog.data.get(self.guild).execute(
-            "INSERT INTO messages (preset_id, timestamp, role, content, username) VALUES (?, ?, ?, ?, ?)",
-            (self.preset_id, datetime.now().timestamp(), role, content, username)
+            "INSERT INTO messages (preset_id, timestamp, role, content, username, tokens) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.preset_id, message['timestamp'], role, content, username, message['tokens'])
         )
-        super().add_message(role, content, username, self.preset_id)
+        return message
         
     def remove_message(self, index: int):
         self.__cog.data.get(self.guild).execute(
@@ -282,6 +970,28 @@ class CustomChatbot(BaseChatbot):
             (self.preset_id,)
         )
         self._messages.clear()
+        self._history_tokens = 0
+        self._uncounted = []
+        self.clear_summary()
+    
+    def _store_summary(self, summary: str, tokens: int, folded: list[dict]):
+        db = self.__cog.data.get(self.guild)
+        db.execute(
+            "UPDATE presets SET summary = ?, summary_tokens = ? WHERE id = ?",
+            (summary, tokens, self.preset_id)
+        )
+        db.execute(
+            "DELETE FROM messages WHERE preset_id = ? AND timestamp <= ?",
+            (self.preset_id, max(m['timestamp'] for m in folded))
+        )
+        super()._store_summary(summary, tokens, folded)
+    
+    def clear_summary(self):
+        self.__cog.data.get(self.guild).execute(
+            "UPDATE presets SET summary = NULL, summary_tokens = NULL WHERE id = ?",
+            (self.preset_id,)
+        )
+        super().clear_summary()
     
     def cleanup_messages_before(self, date: datetime):
         self.__cog.data.get(self.guild).execute(
@@ -289,8 +999,8 @@ class CustomChatbot(BaseChatbot):
             (self.preset_id, date.timestamp())
         )
     
-    async def get_completion(self, prompt: str, username: str = 'user') -> dict[str, str] | None:
-        return await super().get_completion(prompt, username)
+    async def get_completion(self, prompt: str, username: str = 'user', *, on_update: Callable[[str], Awaitable[None]] | None = None) -> dict[str, str] | None:
+        return await super().get_completion(prompt, username, on_update=on_update)
     
     # --- Propriétés ---
     
@@ -311,7 +1021,9 @@ class Robot(commands.Cog):
                 name TEXT,
                 system_prompt TEXT,
                 temperature REAL DEFAULT 0.8,
-                author_id INTEGER
+                author_id INTEGER,
+                summary TEXT,
+                summary_tokens INTEGER
             )"""
         )
         messages = dataio.TableDefault(
@@ -321,6 +1033,7 @@ class Robot(commands.Cog):
                 role TEXT,
                 content TEXT,
                 username TEXT,
+                tokens INTEGER,
                 PRIMARY KEY (preset_id, timestamp),
                 FOREIGN KEY (preset_id) REFERENCES presets(id)
             )"""
@@ -343,9 +1056,41 @@ class Robot(commands.Cog):
 
         self.client = AsyncOpenAI(
             api_key=self.bot.config['OPENAI_API_KEY'], # type: ignore
+            max_retries=0 # Nouvelles tentatives gérées par CompletionClient
         )
+        # Limites réglables dans la configuration selon le palier du compte OpenAI
+        self.completions = CompletionClient(
+            self.client,
+            max_concurrency=int(self.bot.config.get('CHATBOT_MAX_CONCURRENCY', 8)), # type: ignore
+            guild_concurrency=int(self.bot.config.get('CHATBOT_GUILD_CONCURRENCY', 2)), # type: ignore
+            requests_per_minute=int(self.bot.config.get('CHATBOT_REQUESTS_PER_MINUTE', 500)), # type: ignore
+            tokens_per_minute=int(self.bot.config.get('CHATBOT_TOKENS_PER_MINUTE', 80_000)) # type: ignore
+        )
+        # Désactivable avec CHATBOT_RESPONSE_CACHE=0 dans la configuration
+        cache_enabled = str(self.bot.config.get('CHATBOT_RESPONSE_CACHE', '1')) != '0' # type: ignore
+        self.response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE if cache_enabled else 0)
         
         self.__sessions : dict[int, BaseChatbot] = {}
+        self.__queues : dict[int, CompletionQueue] = {}
+        self.__background_tasks : set[asyncio.Task] = set()
+        
+        # Autocomplétion des chatbots, invalidée à chaque modification des presets d'une guilde
+        self._presets_versions : dict[int, int] = {}
+        self._presets_autocomplete = fuzzy.AutocompleteCache(key=lambda x: x['name'])
+        
+        self._migrated_guilds : set[int] = set()
+        
+        self.tokenizer = TokenizerService()
+        
+    async def cog_load(self):
+        try:
+            await self.tokenizer.load()
+        except Exception as e:
+            # L'encodage sera rechargé au premier comptage
+            logger.error(f"Impossible de charger l'encodage '{self.tokenizer.encoding_name}' : {e}")
+            
+    async def cog_unload(self):
+        self.tokenizer.close()
     
     # --- Gestion des presets ---
     
@@ -370,6 +1115,7 @@ class Robot(commands.Cog):
             "INSERT INTO presets (name, system_prompt, temperature, author_id) VALUES (?, ?, ?, ?)",
             (name, system_prompt, temperature, author.id)
         )
+        self._bump_presets_version(author.guild)
         
     def delete_preset(self, guild: discord.Guild, preset_id: int):
         """Supprimer un chatbot personnalisé"""
@@ -381,6 +1127,25 @@ class Robot(commands.Cog):
             "DELETE FROM messages WHERE preset_id = ?",
             (preset_id,)
         )
+        self._bump_presets_version(guild)
+        
+    def migrate_tables(self, guild: discord.Guild):
+        """Ajoute les colonnes des tokens et du résumé aux tables créées avant leur introduction"""
+        if guild.id in self._migrated_guilds:
+            return
+        db = self.data.get(guild)
+        if 'tokens' not in db.fetch_column_names('messages'):
+            db.execute("ALTER TABLE messages ADD COLUMN tokens INTEGER")
+        presets_columns = db.fetch_column_names('presets')
+        if 'summary' not in presets_columns:
+            db.execute("ALTER TABLE presets ADD COLUMN summary TEXT")
+        if 'summary_tokens' not in presets_columns:
+            db.execute("ALTER TABLE presets ADD COLUMN summary_tokens INTEGER")
+        self._migrated_guilds.add(guild.id)
+        
+    def _bump_presets_version(self, guild: discord.Guild):
+        """Invalider l'autocomplétion des chatbots personnalisés d'une guilde"""
+        self._presets_versions[guild.id] = self._presets_versions.get(guild.id, 0) + 1
     
     # --- Gestion des sessions ---
     
@@ -396,6 +1161,32 @@ class Robot(commands.Cog):
         """Terminer une session de chatbot dans un salon donné"""
         self.__sessions.pop(channel.id, None)
         
+    # --- Files de complétion ---
+    
+    def get_completion_queue(self, channel: discord.abc.Messageable) -> CompletionQueue:
+        """Obtenir (ou créer) la file de complétions d'un salon"""
+        channel_id = channel.id # type: ignore
+        if channel_id not in self.__queues:
+            self.__queues[channel_id] = CompletionQueue(self, channel_id)
+        return self.__queues[channel_id]
+    
+    def _release_completion_queue(self, queue: CompletionQueue):
+        """Oublier une file vide dont la génération est terminée"""
+        if not queue.busy and self.__queues.get(queue.channel_id) is queue:
+            del self.__queues[queue.channel_id]
+            
+    def is_completion_request(self, message: discord.Message) -> bool:
+        """Vérifie qu'un message est une demande de complétion recevable (mention du bot, hors commande, auteur non bloqué)"""
+        botuser = self.bot.user
+        if not botuser or not botuser.mentioned_in(message):
+            return False
+        if not isinstance(message.author, discord.Member):
+            return False
+        if not message.content or message.content.startswith(';'):
+            return False
+        tracking = self.get_user_tracking(message.author)
+        return not (tracking and tracking['blocked'])
+        
     # --- Tracking des utilisateurs ---
     
     def get_user_tracking(self, user: discord.User | discord.Member) -> dict | None:
@@ -449,8 +1240,10 @@ class Robot(commands.Cog):
             
     # --- Exploitation de ChatGPT ---
     
-    async def handle_completion(self, prompt_message: discord.Message, *, _continue_completion: bool = False, override: bool = False) -> bool:
-        """Gérer une demande de complétion de message"""
+    async def handle_completion(self, prompt_message: discord.Message, *, others: Sequence[discord.Message] = (), _continue_completion: bool = False, override: bool = False) -> bool:
+        """Gérer une demande de complétion de message
+        
+        :param others: Mentions reçues avant `prompt_message` et regroupées dans le même tour (voir `CompletionQueue`)"""
         botuser = self.bot.user
         if not botuser:
             return False
@@ -476,44 +1269,77 @@ class Robot(commands.Cog):
         if content.startswith(';'): # On ignore les commandes
             return False
         
+        # La réponse est publiée dès le premier fragment puis complétée au fil de la génération
+        reply = StreamingReply(prompt_message, f"`{name} :` ")
         completion = None
         if _continue_completion: # Si la complétion précédente n'est pas terminée ('finish_reason' != 'stop')
             content = 'Suite'
             async with channel.typing():
-                completion = await chatbot.get_completion(content, prompt_message.author.name)
+                completion = await chatbot.get_completion(content, prompt_message.author.name, on_update=reply.update)
         elif botuser.mentioned_in(prompt_message) or override:
+            turn = [*others, prompt_message]
             async with channel.typing():
-                completion = await chatbot.get_completion(content, prompt_message.author.name)
+                completion = await chatbot.get_turn_completion([(m.content, m.author.name) for m in turn], on_update=reply.update)
         
         if completion: # Si une réponse a été générée
-            response = f"`{name} :` {completion['response']}"
             is_finished = completion['finish_reason'] == 'stop'
             usage = completion.get('usage')
+            # Coût d'un tour regroupé (et du résumé qu'il déclenche) partagé entre ses auteurs
+            authors = list({m.author.id: m.author for m in [*others, prompt_message]}.values())
             if usage:
-                self.increment_user_tokens(prompt_message.author, int(usage))
+                for author in authors:
+                    self.increment_user_tokens(author, -(-int(usage) // len(authors)))
+            if chatbot.needs_summary:
+                self.schedule_summary(chatbot, authors)
             
             if is_finished:
-                await prompt_message.reply(response, 
-                                           mention_author=False, 
-                                           suppress_embeds=True, 
-                                           allowed_mentions=discord.AllowedMentions(users=False, roles=False, everyone=False, replied_user=True))
+                await reply.finish(completion['response'])
                 return True # On indique que la complétion s'est terminée
 
             view = ContinueButtonView(timeout=90, author=prompt_message.author)
-            resp = await prompt_message.reply(response, 
-                                              mention_author=False, 
-                                              view=view, 
-                                              suppress_embeds=True, 
-                                              allowed_mentions=discord.AllowedMentions(users=False, roles=False, everyone=False, replied_user=True))
-            await view.wait()
-            if view.value is True:
-                await resp.edit(view=None)
-                await self.handle_completion(resp, _continue_completion=True)
-            else:
-                await resp.edit(view=None)
+            resp = await reply.finish(completion['response'], view=view)
+            # Le bouton est attendu hors de la file du salon, qui peut traiter d'autres mentions entre-temps
+            self.run_in_background(self.__wait_continue(resp, view))
             return True
+        if reply.message: # Génération interrompue après les premiers fragments
+            await reply.finish(reply.text + " *(réponse interrompue)*")
         return False
     
+    def run_in_background(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """Lance une tâche en arrière-plan en gardant une référence jusqu'à sa fin"""
+        task = asyncio.ensure_future(coro)
+        self.__background_tasks.add(task)
+        task.add_done_callback(self.__background_tasks.discard)
+        return task
+    
+    def schedule_summary(self, chatbot: BaseChatbot, users: Sequence[discord.User | discord.Member] = ()):
+        """Résume en arrière-plan les plus anciens échanges d'un chatbot (une seule fois à la fois par chatbot)
+        
+        :param users: Utilisateurs à l'origine du tour qui a déclenché le résumé, qui se partagent son coût"""
+        if chatbot._summarizing:
+            return
+        chatbot._summarizing = True
+        
+        async def summarize():
+            try:
+                usage = await chatbot.summarize()
+            except Exception as e:
+                logger.error(f"Impossible de résumer la conversation : {e}", exc_info=True)
+                chatbot.defer_summary()
+            else:
+                if usage and users:
+                    for user in users:
+                        self.increment_user_tokens(user, -(-usage // len(users)))
+            finally:
+                chatbot._summarizing = False
+        self.run_in_background(summarize())
+    
+    async def __wait_continue(self, resp: discord.Message, view: ContinueButtonView):
+        await view.wait()
+        await resp.edit(view=None)
+        if view.value is True:
+            self.get_completion_queue(resp.channel).submit_continuation(resp)
+    
     # === COMMANDES ===
     
     @app_commands.command(name='ask')
@@ -560,7 +1386,11 @@ class Robot(commands.Cog):
             return await interaction.followup.send("**Erreur** · Impossible de charger le chatbot.", ephemeral=True)
         name = chatbot.name if isinstance(chatbot, CustomChatbot) else 'ChatGPT'
         
-        completion = await chatbot.get_completion(prompt, interaction.user.name)
+        # Même file que les mentions : pas de génération concurrente dans le salon
+        call = self.get_completion_queue(interaction.channel).submit_call(lambda: chatbot.get_completion(prompt, interaction.user.name))
+        if call is None:
+            return await interaction.followup.send(f"**File d'attente pleine** · {COMPLETION_QUEUE_SIZE} messages attendent déjà une réponse dans ce salon, réessayez dans un instant.", ephemeral=True)
+        completion = await call
         if not completion:
             return await interaction.followup.send("**Erreur** · Impossible de générer une réponse.", ephemeral=True)
         
@@ -568,6 +1398,8 @@ class Robot(commands.Cog):
         usage = completion.get('usage')
         if usage:
             self.increment_user_tokens(interaction.user, int(usage))
+        if chatbot.needs_summary:
+            self.schedule_summary(chatbot, [interaction.user])
         
         embed = None
         if disp_embed:
@@ -585,8 +1417,13 @@ class Robot(commands.Cog):
         """Répondre automatiquement aux messages des utilisateurs avec ChatGPT"""
         if message.author.bot:
             return
-        if message.channel.id in self.__sessions:
-            await self.handle_completion(message)
+        if message.channel.id not in self.__sessions or not self.is_completion_request(message):
+            return
+        # Une génération à la fois par salon : les mentions reçues entre-temps forment le tour suivant
+        if not self.get_completion_queue(message.channel).submit(message):
+            await message.reply(f"**File d'attente pleine** · {COMPLETION_QUEUE_SIZE} messages attendent déjà une réponse dans ce salon, réessayez dans un instant.",
+                                mention_author=False,
+                                delete_after=10)
     
     chatbot_group = app_commands.Group(name='chatbot', description="Gestion des presets de chatbots personnalisés", guild_only=True)
     
@@ -654,8 +1491,7 @@ class Robot(commands.Cog):
         if len(name) > 32:
             return await interaction.response.send_message("**Nom trop long** · Le nom du chatbot ne doit pas dépasser 32 caractères.", ephemeral=True)
         
-        system_tokens = tiktoken.get_encoding('cl100k_base').encode(system_prompt)
-        if len(system_tokens) > MAX_COMPLETION_TOKENS // 2:
+        if await self.tokenizer.count_tokens(system_prompt) > MAX_COMPLETION_TOKENS // 2:
             return await interaction.response.send_message(f"**Instructions trop longues** · Les instructions ne doivent pas dépasser {MAX_COMPLETION_TOKENS // 2} tokens (soit environ {MAX_COMPLETION_TOKENS // 2 * 2} caractères).", ephemeral=True)
         
         await interaction.response.defer(ephemeral=True)
@@ -696,8 +1532,7 @@ class Robot(commands.Cog):
             if len(name) > 32:
                 return await interaction.response.send_message("**Nom trop long** · Le nom du chatbot ne doit pas dépasser 32 caractères.", ephemeral=True)
         if system_prompt:
-            system_tokens = tiktoken.get_encoding('cl100k_base').encode(system_prompt)
-            if len(system_tokens) > MAX_COMPLETION_TOKENS // 2:
+            if await self.tokenizer.count_tokens(system_prompt) > MAX_COMPLETION_TOKENS // 2:
                 return await interaction.response.send_message(f"**Instructions trop longues** · Les instructions ne doivent pas dépasser {MAX_COMPLETION_TOKENS // 2} tokens (soit environ {MAX_COMPLETION_TOKENS // 2 * 2} caractères).", ephemeral=True)
         
         await interaction.response.defer(ephemeral=True)
@@ -712,6 +1547,7 @@ class Robot(commands.Cog):
         
         if name:
             self.data.get(interaction.guild).execute("UPDATE presets SET name = ? WHERE id = ?", (name, preset_id))
+            self._bump_presets_version(interaction.guild)
         if system_prompt:
             self.data.get(interaction.guild).execute("UPDATE presets SET system_prompt = ? WHERE id = ?", (system_prompt, preset_id))
         if temperature:
@@ -754,8 +1590,9 @@ class Robot(commands.Cog):
     async def chatbot_id_autocomplete(self, interaction: discord.Interaction, current: str):
         if not isinstance(interaction.guild, discord.Guild):
             return []
-        presets = self.get_presets(interaction.guild)
-        r = fuzzy.finder(current, presets, key=lambda x: x['name'])
+        guild = interaction.guild
+        scope = (guild.id, interaction.user.id, interaction.command.qualified_name if interaction.command else None)
+        r = self._presets_autocomplete.finder(scope, self._presets_versions.get(guild.id, 0), current, lambda: self.get_presets(guild))
         return [app_commands.Choice(name=p['name'], value=p['id']) for p in r]
         
     blocklist_group = app_commands.Group(name='blocklist', description="Gestion des utilisateurs bloqués", guild_only=True, default_permissions=discord.Permissions(manage_messages=True))
@@ -843,6 +1680,32 @@ class Robot(commands.Cog):
         embed.description = pretty.codeblock('\n'.join(text))
         embed.set_footer(text=f"Tokens générés ce mois-ci seulement\nTotal tokens : {sum(u['tokens_generated'] for u in users)} ≈ {total_cost:.4f}$\n(*) Comptage fonction 'continuer'")
         await interaction.response.send_message(embed=embed)
+        
+    @stats_group.command(name='api')
+    async def stats_api(self, interaction: Interaction):
+        """Afficher l'état des requêtes en cours vers l'API d'OpenAI"""
+        stats = self.completions.stats
+        embed = discord.Embed(title="Statistiques ChatGPT · API", color=discord.Color.blurple())
+        embed.add_field(name="En cours", value=pretty.codeblock(str(stats['in_flight'])))
+        embed.add_field(name="En attente", value=pretty.codeblock(str(stats['queued'])))
+        embed.add_field(name="Réessayées", value=pretty.codeblock(str(stats['retried'])))
+        embed.add_field(name="Échouées", value=pretty.codeblock(str(stats['failed'])))
+        embed.set_footer(text="Depuis le dernier chargement du module")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+    @stats_group.command(name='cache')
+    async def stats_cache(self, interaction: Interaction):
+        """Afficher l'efficacité du cache de réponses des chatbots"""
+        cache = self.response_cache
+        if not cache.max_entries:
+            return await interaction.response.send_message("**Cache désactivé** · Le cache de réponses n'est pas activé sur ce bot.", ephemeral=True)
+        conv = 0.0015 / 1000
+        embed = discord.Embed(title="Statistiques ChatGPT · Cache de réponses", color=discord.Color.blurple())
+        embed.add_field(name="Taux de succès", value=pretty.codeblock(f"{cache.hit_rate:.1%} ({cache.hits}/{cache.lookups})"))
+        embed.add_field(name="Tokens économisés", value=pretty.codeblock(f"{cache.tokens_saved} ≈ {cache.tokens_saved * conv:.4f}$"))
+        embed.add_field(name="Entrées", value=pretty.codeblock(f"{len(cache)}/{cache.max_entries}"))
+        embed.set_footer(text=f"Chatbots de température ≤ {cache.max_temperature} · Réponses conservées {cache.ttl / 60:.0f} minutes\nDepuis le dernier chargement du module")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
             
 async def setup(bot):
     await bot.add_cog(Robot(bot))
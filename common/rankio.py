@@ -3,18 +3,98 @@
 A utiliser en important le module `rankio` dans les cogs concernés.
 """
 
+import asyncio
+import functools
+import heapq
+import logging
+import math
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import sqlite3
 from contextlib import closing
 from pathlib import Path
-from typing import Any, Iterable, Sequence, overload
+from typing import Any, Callable, Iterable, Iterator, Literal, NamedTuple, Sequence, overload
 
 import discord
 from discord.ext import commands
 
+logger = logging.getLogger('WANDR.rankio')
+
 PRESTIGE_SYMB = '✱'
 DB_PATH = Path('common/public')
+RETENTION_DAYS = 90 # Au-delà, les points journaliers sont repliés en totaux mensuels
+HOURLY_RETENTION_HOURS = 48 # Au-delà, les points horaires sont repliés en points journaliers
+HOUR_FORMAT = '%Y-%m-%d %H'
+COMPACTION_BATCH_SIZE = 500
+LEDGER_BATCH_SIZE = 500
+DECAY_HALF_LIFE_DAYS = 7 # Demi-vie du prestige "dynamique"
+DECAY_EPOCH = datetime(2024, 1, 1).timestamp() # Référence des scores décroissants créés avant son enregistrement en base
+DECAY_RENORMALIZE_DAYS = 28 # Écart maximal entre la référence des scores décroissants et le jour courant (voir `GuildRanking.renormalize_decay`)
 _RANKINGS : dict[int, 'GuildRanking'] = {}
+_GLOBAL : 'GlobalRanking | None' = None
+
+class _DatabaseThread:
+    def __init__(self, name: str, opener: Callable[[], None]):
+        """Thread dédié à une base de données : toutes ses requêtes y sont exécutées, dans l'ordre de soumission
+        
+        :param name: Nom du thread
+        :param opener: Fonction ouvrant la connexion (exécutée dans le thread)"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._ident : int | None = None
+        self._ready = self._executor.submit(self.__start, opener)
+        
+    def __start(self, opener: Callable[[], None]):
+        self._ident = threading.get_ident()
+        opener()
+        
+    def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Exécute une fonction dans le thread et attend son résultat (bloquant)"""
+        if threading.get_ident() == self._ident:
+            return func(*args, **kwargs)
+        self._ready.result()
+        return self._executor.submit(func, *args, **kwargs).result()
+    
+    async def arun(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Exécute une fonction dans le thread sans bloquer la boucle d'événements"""
+        await self.ready()
+        return await asyncio.wrap_future(self._executor.submit(func, *args, **kwargs))
+    
+    async def ready(self):
+        """Attend l'ouverture de la connexion"""
+        await asyncio.wrap_future(self._ready)
+        
+    def close(self, closer: Callable[[], None]):
+        """Ferme la connexion puis arrête le thread"""
+        try:
+            self._executor.submit(closer)
+        except RuntimeError: # Interpréteur en cours d'arrêt
+            return
+        self._executor.shutdown(wait=False)
+
+def _threaded(func):
+    # La méthode est toujours exécutée dans le thread de la base de données de l'objet (attribut `_thread`)
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self._thread.run(func, self, *args, **kwargs)
+    return wrapper
+
+def _awaitable(func):
+    # Version asynchrone d'une méthode `_threaded`
+    async def wrapper(self, *args, **kwargs):
+        return await self._thread.arun(func, self, *args, **kwargs)
+    wrapper.__name__ = f'a{func.__name__}'
+    wrapper.__qualname__ = func.__qualname__.replace(func.__name__, wrapper.__name__)
+    wrapper.__doc__ = f"Version asynchrone de `{func.__name__}`, exécutée sans bloquer la boucle d'événements"
+    return wrapper
+
+class PointsEvent(NamedTuple):
+    """Attribution (ou retrait) de points enregistrée dans le registre"""
+    user_id: int
+    delta: int
+    source: str = 'manual'
+    timestamp: float | None = None # Par défaut, maintenant
 
 class GuildRanking:
     def __init__(self, guild: discord.Guild):
@@ -23,10 +103,15 @@ class GuildRanking:
         :param guild: Serveur Discord concerné
         """
         self.guild = guild
-        self.db = Path(f'common/public/Ranking_{guild.id}.db')
+        self.db = _db_path(guild.id)
         
-        self._conn = self._connect()
-        self._initialize()
+        # Index des membres présents, tenu à jour par les événements d'arrivée et de départ (discord.py modifie les membres en cache sur place)
+        self.__index : dict[int, discord.Member] = {m.id: m for m in guild.members}
+        
+        # La connexion n'est utilisée que depuis le thread dédié au serveur
+        self._conn : sqlite3.Connection
+        self._decay_epoch : float = DECAY_EPOCH
+        self._thread = _DatabaseThread(f'rankio-{guild.id}', functools.partial(self.__open, set(self.__index)))
         
         self.__members : dict[int, MemberRanking] = {}
         
@@ -34,9 +119,18 @@ class GuildRanking:
         return f'<GuildRanking guild={self.guild!r}>'
         
     def __del__(self):
-        self._conn.close() 
+        self._thread.close(self.__close)
         
     # --- Base de données ---
+    
+    def __open(self, present: set[int]):
+        self._conn = self._connect()
+        self._initialize()
+        self.__load_absent(present)
+        
+    def __close(self):
+        if hasattr(self, '_conn'):
+            self._conn.close()
         
     def _connect(self) -> sqlite3.Connection:
         if not DB_PATH.exists():
@@ -45,6 +139,16 @@ class GuildRanking:
         db.row_factory = sqlite3.Row
         return db
     
+    def __load_absent(self, present: set[int]):
+        # Membres classés ayant quitté le serveur, exclus des classements directement en SQL (table propre à la connexion)
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS ranking_absent (user_id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM ranking_absent")
+            cursor.execute("SELECT user_id FROM ranking_totals")
+            absent = [(row['user_id'],) for row in cursor.fetchall() if row['user_id'] not in present]
+            cursor.executemany("INSERT INTO ranking_absent (user_id) VALUES (?)", absent)
+            self._conn.commit()
+    
     def _initialize(self):
         with closing(self._conn.cursor()) as cursor:
             cursor.execute("""
@@ -55,7 +159,444 @@ class GuildRanking:
                     PRIMARY KEY (user_id, date)
                 )
             """)
+            # Les replis et compactages parcourent les lignes par date, tous membres confondus
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS ranking_date ON ranking (date)
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_hourly (
+                    user_id INTEGER,
+                    hour TEXT,
+                    points INTEGER DEFAULT 0,
+                    PRIMARY KEY (user_id, hour)
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS ranking_hourly_hour ON ranking_hourly (hour)
+            """)
+            # Points par jour, qu'ils soient déjà repliés ou encore détaillés à l'heure
+            cursor.execute("""
+                CREATE VIEW IF NOT EXISTS ranking_days (user_id, date, points) AS
+                SELECT user_id, date, points FROM ranking
+                UNION ALL
+                SELECT user_id, substr(hour, 1, 10), points FROM ranking_hourly
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_monthly (
+                    user_id INTEGER,
+                    month TEXT,
+                    points INTEGER DEFAULT 0,
+                    PRIMARY KEY (user_id, month)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_totals (
+                    user_id INTEGER PRIMARY KEY,
+                    points INTEGER DEFAULT 0
+                )
+            """)
+            
+            # Registre des attributions : seule source de vérité, les tables ci-dessus en sont des vues matérialisées
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'ranking_ledger'")
+            new_ledger = cursor.fetchone() is None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_ledger (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    timestamp REAL,
+                    delta INTEGER,
+                    source TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS ranking_ledger_user ON ranking_ledger (user_id, timestamp)
+            """)
+            if new_ledger:
+                self.__migrate_to_ledger(cursor)
+                
+            # Métadonnées : identifiant aléatoire du registre, propre à chaque base et renouvelé dès que des attributions en sont supprimées
+            # (voir `GlobalRanking.refresh`), et référence des scores décroissants
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_meta (
+                    key TEXT PRIMARY KEY,
+                    value
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO ranking_meta (key, value) VALUES ('ledger_id', ?)", (uuid.uuid4().hex,))
+                
+            # Prestige décroissant, stocké relativement à une référence (`decay_epoch`) : ajout en O(1) et ordre indépendant de l'instant de lecture
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'ranking_decay'")
+            new_decay = cursor.fetchone() is None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranking_decay (
+                    user_id INTEGER PRIMARY KEY,
+                    score REAL DEFAULT 0,
+                    last_update REAL
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS ranking_decay_score ON ranking_decay (score)
+            """)
+            # Les scores existants sans référence enregistrée sont relatifs à DECAY_EPOCH
+            cursor.execute("INSERT OR IGNORE INTO ranking_meta (key, value) VALUES ('decay_epoch', ?)", (DECAY_EPOCH,))
+            self._decay_epoch = cursor.execute("SELECT value FROM ranking_meta WHERE key = 'decay_epoch'").fetchone()['value']
+            if new_decay:
+                self.__rebuild_decay(cursor)
+            
+            # Les attributions récentes sont détaillées à l'heure, les attributions antidatées au-delà de la rétention horaire vont directement au jour
+            # (recréé à chaque ouverture pour suivre HOURLY_RETENTION_HOURS)
+            cursor.execute("DROP TRIGGER IF EXISTS ranking_ledger_insert")
+            cursor.execute(f"""
+                CREATE TRIGGER ranking_ledger_insert AFTER INSERT ON ranking_ledger
+                BEGIN
+                    INSERT INTO ranking_hourly (user_id, hour, points)
+                    SELECT NEW.user_id, strftime('%Y-%m-%d %H', NEW.timestamp, 'unixepoch', 'localtime'), NEW.delta
+                    WHERE NEW.timestamp >= CAST(strftime('%s', 'now') AS REAL) - {HOURLY_RETENTION_HOURS * 3600}
+                    ON CONFLICT (user_id, hour) DO UPDATE SET points = points + excluded.points;
+                    INSERT INTO ranking (user_id, date, points)
+                    SELECT NEW.user_id, date(NEW.timestamp, 'unixepoch', 'localtime'), NEW.delta
+                    WHERE NEW.timestamp < CAST(strftime('%s', 'now') AS REAL) - {HOURLY_RETENTION_HOURS * 3600}
+                    ON CONFLICT (user_id, date) DO UPDATE SET points = points + excluded.points;
+                    INSERT INTO ranking_totals (user_id, points) VALUES (NEW.user_id, NEW.delta)
+                    ON CONFLICT (user_id) DO UPDATE SET points = points + excluded.points;
+                END
+            """)
+            self._conn.commit()
+            
+    def __migrate_to_ledger(self, cursor: sqlite3.Cursor):
+        # Les points existants sont repris dans le registre (avant la création du trigger, pour ne pas les compter deux fois)
+        events = []
+        for row in cursor.execute("SELECT user_id, date, points FROM ranking").fetchall():
+            events.append((row['user_id'], _date_timestamp(row['date']), row['points'], 'legacy'))
+        for row in cursor.execute("SELECT user_id, month, points FROM ranking_monthly").fetchall():
+            events.append((row['user_id'], _date_timestamp(row['month'] + '-01'), row['points'], 'legacy'))
+        cursor.executemany("""
+            INSERT INTO ranking_ledger (user_id, timestamp, delta, source) VALUES (?, ?, ?, ?)
+        """, events)
+        cursor.execute("""
+            INSERT OR REPLACE INTO ranking_totals (user_id, points)
+            SELECT user_id, SUM(delta) FROM ranking_ledger GROUP BY user_id
+        """)
+        
+    def __rebuild_decay(self, cursor: sqlite3.Cursor):
+        # Scores entièrement recalculés : la référence repart du jour courant
+        epoch = _day_start()
+        scores : dict[int, tuple[float, float]] = {}
+        totals : dict[int, int] = {}
+        for row in cursor.execute("SELECT user_id, timestamp, delta FROM ranking_ledger").fetchall():
+            score, last_update = scores.get(row['user_id'], (0.0, row['timestamp']))
+            scores[row['user_id']] = (score + row['delta'] * _decay_weight(row['timestamp'], epoch), max(last_update, row['timestamp']))
+            totals[row['user_id']] = totals.get(row['user_id'], 0) + row['delta']
+        cursor.execute("DELETE FROM ranking_decay")
+        # Membres remis à zéro (voir `MemberRanking.clear_all`) : pas de prestige résiduel
+        cursor.executemany("""
+            INSERT INTO ranking_decay (user_id, score, last_update) VALUES (?, ?, ?)
+        """, [(user_id, score, last_update) for user_id, (score, last_update) in scores.items() if totals[user_id]])
+        cursor.execute("UPDATE ranking_meta SET value = ? WHERE key = 'decay_epoch'", (epoch,))
+        self._decay_epoch = epoch
+        
+    @_threaded
+    def renormalize_decay(self, days: int = DECAY_RENORMALIZE_DAYS) -> bool:
+        """Avance la référence des scores décroissants au jour courant si elle date de plus de `days` jours
+        
+        Les poids croissent exponentiellement avec l'écart à la référence : la rapprocher régulièrement évite tout dépassement flottant.
+        Les scores sont multipliés par le même facteur, leur ordre et leurs valeurs décroissantes ne changent pas.
+        
+        :param days: Écart toléré entre la référence et le jour courant
+        :return: True si la référence a été avancée"""
+        epoch = _day_start()
+        if epoch - self._decay_epoch < days * 86400:
+            return False
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("UPDATE ranking_decay SET score = score * ?", (_decay_weight(self._decay_epoch, epoch),))
+            cursor.execute("UPDATE ranking_meta SET value = ? WHERE key = 'decay_epoch'", (epoch,))
             self._conn.commit()
+        self._decay_epoch = epoch
+        return True
+    
+    arenormalize_decay = _awaitable(renormalize_decay)
+        
+    # --- Index des membres ---
+    
+    def add_member(self, member: discord.Member):
+        """Ajoute un membre (nouveau ou de retour) à l'index des membres présents
+        
+        :param member: Membre ayant rejoint le serveur"""
+        self.update_member(member)
+        self.__set_absent(member.id, False)
+        
+    async def aadd_member(self, member: discord.Member):
+        """Version asynchrone de `add_member`, exécutée sans bloquer la boucle d'événements"""
+        self.update_member(member)
+        await self._thread.arun(self.__set_absent, member.id, False)
+    
+    def update_member(self, member: discord.Member):
+        """Met à jour un membre dans l'index (pseudo, avatar...)
+        
+        :param member: Membre modifié"""
+        self.__index[member.id] = member
+        if member.id in self.__members:
+            self.__members[member.id].member = member
+            
+    def remove_member(self, member: discord.abc.User):
+        """Retire un membre de l'index et l'exclut des classements
+        
+        :param member: Membre ayant quitté le serveur"""
+        self.__index.pop(member.id, None)
+        self.__members.pop(member.id, None)
+        self.__set_absent(member.id, True)
+        
+    async def aremove_member(self, member: discord.abc.User):
+        """Version asynchrone de `remove_member`, exécutée sans bloquer la boucle d'événements"""
+        self.__index.pop(member.id, None)
+        self.__members.pop(member.id, None)
+        await self._thread.arun(self.__set_absent, member.id, True)
+        
+    @_threaded
+    def __set_absent(self, user_id: int, absent: bool):
+        with closing(self._conn.cursor()) as cursor:
+            if absent:
+                cursor.execute("INSERT OR IGNORE INTO ranking_absent (user_id) VALUES (?)", (user_id,))
+            else:
+                cursor.execute("DELETE FROM ranking_absent WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+    
+    # --- Registre ---
+    
+    @_threaded
+    def ingest(self, events: Iterable[PointsEvent], *, batch_size: int = LEDGER_BATCH_SIZE) -> int:
+        """Enregistre des attributions de points par lots
+        
+        Les totaux journaliers et cumulés sont tenus à jour par la base à chaque insertion.
+        
+        :param events: Attributions à enregistrer
+        :param batch_size: Nombre d'attributions enregistrées par transaction
+        :return: Nombre d'attributions enregistrées"""
+        count = 0
+        batch = []
+        with closing(self._conn.cursor()) as cursor:
+            for event in events:
+                timestamp = event.timestamp if event.timestamp is not None else datetime.now().timestamp()
+                batch.append((event.user_id, timestamp, event.delta, event.source))
+                if event.user_id not in self.__index:
+                    cursor.execute("INSERT OR IGNORE INTO ranking_absent (user_id) VALUES (?)", (event.user_id,))
+                if len(batch) >= batch_size:
+                    count += _insert_events(cursor, batch, self._decay_epoch)
+                    self._conn.commit()
+                    batch = []
+            if batch:
+                count += _insert_events(cursor, batch, self._decay_epoch)
+                self._conn.commit()
+        return count
+    
+    aingest = _awaitable(ingest)
+    
+    @_threaded
+    def _get_ledger_id(self) -> str:
+        with closing(self._conn.cursor()) as cursor:
+            return cursor.execute("SELECT value FROM ranking_meta WHERE key = 'ledger_id'").fetchone()['value']
+    
+    @_threaded
+    def _get_events_after(self, last_id: int, limit: int) -> list[sqlite3.Row]:
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT id, user_id, delta FROM ranking_ledger WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, limit))
+            return cursor.fetchall()
+    
+    @_threaded
+    def replay(self, since: datetime | str):
+        """Recalcule les vues matérialisées à partir du registre
+        
+        Les points journaliers sont reconstruits à partir de `since` (qui doit rester dans la période de rétention), les points horaires et les totaux en intégralité.
+        
+        :param since: Date à partir de laquelle reconstruire les points journaliers"""
+        if isinstance(since, datetime):
+            since = since.strftime('%Y-%m-%d')
+        hourly_cutoff = datetime.now().timestamp() - HOURLY_RETENTION_HOURS * 3600
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("DELETE FROM ranking WHERE date >= ?", (since,))
+            cursor.execute("""
+                INSERT INTO ranking (user_id, date, points)
+                SELECT user_id, date(timestamp, 'unixepoch', 'localtime') AS day, SUM(delta)
+                FROM ranking_ledger
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY user_id, day
+                HAVING SUM(delta) != 0
+            """, (datetime.strptime(since, '%Y-%m-%d').timestamp(), hourly_cutoff))
+            cursor.execute("DELETE FROM ranking_hourly")
+            cursor.execute("""
+                INSERT INTO ranking_hourly (user_id, hour, points)
+                SELECT user_id, strftime('%Y-%m-%d %H', timestamp, 'unixepoch', 'localtime') AS hour, SUM(delta)
+                FROM ranking_ledger
+                WHERE timestamp >= ?
+                GROUP BY user_id, hour
+                HAVING SUM(delta) != 0
+            """, (hourly_cutoff,))
+            cursor.execute("DELETE FROM ranking_totals")
+            cursor.execute("""
+                INSERT INTO ranking_totals (user_id, points)
+                SELECT user_id, SUM(delta) FROM ranking_ledger GROUP BY user_id HAVING SUM(delta) != 0
+            """)
+            self.__rebuild_decay(cursor)
+            # Le registre a pu être corrigé à la main avant la reconstruction : le classement global le relira en entier
+            _renew_ledger_id(cursor)
+            self._conn.commit()
+            
+    areplay = _awaitable(replay)
+            
+    # --- Rétention ---
+    
+    def downsample(self, hours: int = HOURLY_RETENTION_HOURS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Replie les points horaires de plus de `hours` heures en points journaliers
+        
+        :param hours: Nombre d'heures de détail à conserver
+        :param batch_size: Nombre de lignes traitées par transaction
+        :return: Nombre de lignes horaires repliées"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).strftime(HOUR_FORMAT)
+        downsampled = 0
+        while count := self.__downsample_batch(cutoff, batch_size):
+            downsampled += count
+        return downsampled
+    
+    async def adownsample(self, hours: int = HOURLY_RETENTION_HOURS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Version asynchrone de `downsample`, exécutée sans bloquer la boucle d'événements"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).strftime(HOUR_FORMAT)
+        downsampled = 0
+        while count := await self._thread.arun(self.__downsample_batch, cutoff, batch_size):
+            downsampled += count
+        return downsampled
+    
+    @_threaded
+    def __downsample_batch(self, cutoff: str, batch_size: int) -> int:
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT rowid, user_id, hour, points FROM ranking_hourly WHERE hour < ? LIMIT ?
+            """, (cutoff, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            
+            days : dict[tuple[int, str], int] = {}
+            for row in rows:
+                key = (row['user_id'], row['hour'][:10])
+                days[key] = days.get(key, 0) + row['points']
+            cursor.executemany("""
+                INSERT INTO ranking (user_id, date, points) VALUES (?, ?, ?)
+                ON CONFLICT (user_id, date) DO UPDATE SET points = points + excluded.points
+            """, [(user_id, date, points) for (user_id, date), points in days.items()])
+            cursor.executemany("""
+                DELETE FROM ranking_hourly WHERE rowid = ?
+            """, [(row['rowid'],) for row in rows])
+            self._conn.commit()
+        return len(rows)
+    
+    def compact(self, days: int = RETENTION_DAYS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Replie les points journaliers de plus de `days` jours en totaux mensuels
+        
+        Chaque lot est déplacé dans une seule transaction : les totaux restent exacts même si le traitement est interrompu.
+        La référence des scores décroissants est avancée et le registre regroupé au passage (voir `renormalize_decay` et `fold_ledger`).
+        
+        :param days: Nombre de jours de détail à conserver
+        :param batch_size: Nombre de lignes traitées par transaction
+        :return: Nombre de lignes journalières compactées"""
+        self.renormalize_decay()
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        compacted = 0
+        while count := self.__compact_batch(cutoff, batch_size):
+            compacted += count
+        self.fold_ledger(days, batch_size=batch_size)
+        return compacted
+    
+    async def acompact(self, days: int = RETENTION_DAYS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Version asynchrone de `compact`, exécutée sans bloquer la boucle d'événements
+        
+        Les lots sont soumis un par un : les autres requêtes du serveur peuvent s'intercaler entre deux lots."""
+        await self.arenormalize_decay()
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        compacted = 0
+        while count := await self._thread.arun(self.__compact_batch, cutoff, batch_size):
+            compacted += count
+        await self.afold_ledger(days, batch_size=batch_size)
+        return compacted
+    
+    @_threaded
+    def __compact_batch(self, cutoff: str, batch_size: int) -> int:
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT rowid, user_id, date, points FROM ranking WHERE date < ? LIMIT ?
+            """, (cutoff, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            
+            months : dict[tuple[int, str], int] = {}
+            for row in rows:
+                key = (row['user_id'], row['date'][:7])
+                months[key] = months.get(key, 0) + row['points']
+            cursor.executemany("""
+                INSERT INTO ranking_monthly (user_id, month, points) VALUES (?, ?, ?)
+                ON CONFLICT (user_id, month) DO UPDATE SET points = points + excluded.points
+            """, [(user_id, month, points) for (user_id, month), points in months.items()])
+            cursor.executemany("""
+                DELETE FROM ranking WHERE rowid = ?
+            """, [(row['rowid'],) for row in rows])
+            self._conn.commit()
+        return len(rows)
+    
+    def fold_ledger(self, days: int = RETENTION_DAYS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Regroupe les attributions des mois entièrement sortis de la rétention en une seule attribution par membre et par mois (source `summary`)
+        
+        Les vues matérialisées ne changent pas (seuls les mois déjà repliés en totaux mensuels sont concernés), mais le registre
+        reste de taille bornée pour les recalculs complets (`replay`, prestige décroissant, classement global).
+        
+        :param days: Nombre de jours de détail à conserver
+        :param batch_size: Nombre de groupes (membre, mois) traités par transaction
+        :return: Nombre d'attributions supprimées du registre"""
+        cutoff = _month_start(datetime.now() - timedelta(days=days))
+        folded = 0
+        while count := self.__fold_ledger_batch(cutoff, batch_size):
+            folded += count
+        return folded
+    
+    async def afold_ledger(self, days: int = RETENTION_DAYS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> int:
+        """Version asynchrone de `fold_ledger`, exécutée sans bloquer la boucle d'événements"""
+        cutoff = _month_start(datetime.now() - timedelta(days=days))
+        folded = 0
+        while count := await self._thread.arun(self.__fold_ledger_batch, cutoff, batch_size):
+            folded += count
+        return folded
+    
+    @_threaded
+    def __fold_ledger_batch(self, cutoff: datetime, batch_size: int) -> int:
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT user_id, strftime('%Y-%m', timestamp, 'unixepoch', 'localtime') AS month,
+                       MIN(id) AS id, MIN(timestamp) AS timestamp, SUM(delta) AS delta, COUNT(*) AS events
+                FROM ranking_ledger
+                WHERE timestamp < ?
+                GROUP BY user_id, month
+                HAVING COUNT(*) > 1
+                LIMIT ?
+            """, (cutoff.timestamp(), batch_size))
+            groups = cursor.fetchall()
+            if not groups:
+                return 0
+            
+            # La première attribution du mois est mise à jour plutôt que réinsérée : le trigger d'insertion ne la compte pas une seconde fois
+            for group in groups:
+                start = datetime.strptime(group['month'], '%Y-%m')
+                cursor.execute("""
+                    DELETE FROM ranking_ledger WHERE user_id = ? AND timestamp >= ? AND timestamp < ? AND id != ?
+                """, (group['user_id'], start.timestamp(), _month_start(start + timedelta(days=31)).timestamp(), group['id']))
+                cursor.execute("""
+                    UPDATE ranking_ledger SET timestamp = ?, delta = ?, source = 'summary' WHERE id = ?
+                """, (group['timestamp'], group['delta'], group['id']))
+            # Attributions supprimées du registre : le classement global devra recalculer la contribution du serveur
+            _renew_ledger_id(cursor)
+            self._conn.commit()
+        return sum(group['events'] - 1 for group in groups)
+
         
     # --- Membres du serveur ---
     
@@ -66,51 +607,109 @@ class GuildRanking:
         :return: Classement du membre
         """
         if member.id not in self.__members:
-            self.__members[member.id] = MemberRanking(member, self._conn)
+            self.__members[member.id] = MemberRanking(member, self)
         return self.__members[member.id]
     
     # --- Classement ---
     
-    def get_top(self, days: int = 7, limit: int = 10) -> Sequence[tuple[discord.Member, int]]:
+    def get_top(self, days: int = 7, limit: int = 10, *, mode: Literal['window', 'decay'] = 'window') -> Sequence[tuple[discord.Member, int]]:
         """Récupère le classement des membres du serveur sur une période donnée
         
-        :param days: Nombre de jours à prendre en compte
+        :param days: Nombre de jours à prendre en compte (mode `window`)
         :param limit: Nombre de membres à afficher
+        :param mode: `window` pour la somme des points sur `days` jours, `decay` pour le prestige décroissant
         :return: Liste des membres classés"""
-        date = datetime.now() - timedelta(days=days)
-        members_ids = {m.id: m for m in self.guild.members}
+        return self.__resolve(self.__get_top_rows(days, limit, mode))
+    
+    async def aget_top(self, days: int = 7, limit: int = 10, *, mode: Literal['window', 'decay'] = 'window') -> Sequence[tuple[discord.Member, int]]:
+        """Version asynchrone de `get_top`, exécutée sans bloquer la boucle d'événements"""
+        return self.__resolve(await self._thread.arun(self.__get_top_rows, days, limit, mode))
+    
+    def __resolve(self, rows: Iterable[tuple[int, int]]) -> list[tuple[discord.Member, int]]:
+        # Les absents sont déjà exclus en SQL : seul un départ concurrent à la requête peut manquer à l'index
+        return [(self.__index[user_id], points) for user_id, points in rows if user_id in self.__index]
+    
+    @_threaded
+    def __get_top_rows(self, days: int, limit: int, mode: Literal['window', 'decay']) -> list[tuple[int, int]]:
+        if mode == 'decay':
+            with closing(self._conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT user_id, score FROM ranking_decay
+                    WHERE user_id NOT IN (SELECT user_id FROM ranking_absent)
+                    ORDER BY score DESC
+                    LIMIT ?
+                """, (limit,))
+                return [(row['user_id'], round(_decayed_value(row['score'], self._decay_epoch))) for row in cursor.fetchall()]
+        source, params = _window_source(days)
         with closing(self._conn.cursor()) as cursor:
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT user_id, SUM(points) AS total_points
-                FROM ranking
-                WHERE date >= ?
+                FROM ({source})
+                WHERE user_id NOT IN (SELECT user_id FROM ranking_absent)
                 GROUP BY user_id
                 ORDER BY total_points DESC
                 LIMIT ?
-            """, (date.strftime('%Y-%m-%d'), limit))
-            return [(members_ids[row['user_id']], row['total_points']) for row in cursor.fetchall()]    
+            """, (*params, limit))
+            return [(row['user_id'], row['total_points']) for row in cursor.fetchall()]
+        
+    def get_tops(self, periods: Sequence[int | None] = (1, 7, 30, None), limit: int = 10) -> dict[int | None, list[tuple[discord.Member, int]]]:
+        """Récupère les classements des membres du serveur sur plusieurs périodes en une seule lecture
+        
+        :param periods: Périodes en nombre de jours (`None` pour le classement de tous les temps)
+        :param limit: Nombre de membres à afficher par classement
+        :return: Liste des membres classés pour chaque période"""
+        return self.__build_tops(self._get_period_scores(periods), limit)
+    
+    async def aget_tops(self, periods: Sequence[int | None] = (1, 7, 30, None), limit: int = 10) -> dict[int | None, list[tuple[discord.Member, int]]]:
+        """Version asynchrone de `get_tops`, exécutée sans bloquer la boucle d'événements"""
+        return self.__build_tops(await self._thread.arun(self._get_period_scores, periods), limit)
+    
+    def get_leaderboard(self, member: discord.abc.User, periods: Sequence[int | None] = (1, 7, 30, None), limit: int = 10) -> tuple[dict[int | None, list[tuple[discord.Member, int]]], dict[int | None, int]]:
+        """Récupère les classements sur plusieurs périodes et le rang d'un membre dans chacun, à partir d'une seule lecture
+        
+        :param member: Membre dont le rang est demandé
+        :param periods: Périodes en nombre de jours (`None` pour le classement de tous les temps)
+        :param limit: Nombre de membres à afficher par classement
+        :return: Liste des membres classés et rang du membre (0 s'il n'est pas classé) pour chaque période"""
+        scores = self._get_period_scores(periods)
+        return self.__build_tops(scores, limit), _personal_ranks(scores, member.id)
+    
+    async def aget_leaderboard(self, member: discord.abc.User, periods: Sequence[int | None] = (1, 7, 30, None), limit: int = 10) -> tuple[dict[int | None, list[tuple[discord.Member, int]]], dict[int | None, int]]:
+        """Version asynchrone de `get_leaderboard`, exécutée sans bloquer la boucle d'événements"""
+        scores = await self._thread.arun(self._get_period_scores, periods)
+        return self.__build_tops(scores, limit), _personal_ranks(scores, member.id)
+    
+    def __build_tops(self, scores: dict[int | None, dict[int, int]], limit: int) -> dict[int | None, list[tuple[discord.Member, int]]]:
+        tops = {}
+        for period, period_scores in scores.items():
+            top = heapq.nlargest(limit, period_scores.items(), key=lambda s: s[1])
+            tops[period] = self.__resolve(top)
+        return tops
+    
+    @_threaded
+    def _get_period_scores(self, periods: Sequence[int | None]) -> dict[int | None, dict[int, int]]:
+        return _get_period_scores(self._conn, periods)
     
 
 class MemberRanking:
-    def __init__(self, member: discord.Member, conn: sqlite3.Connection):
+    def __init__(self, member: discord.Member, ranking: GuildRanking):
         self.member = member
-        self.conn = conn
-        
-        self.__points : dict[str, int] = {}
+        self.ranking = ranking
         
     def __repr__(self) -> str:
         return f'<MemberRanking member={self.member!r}>'
     
+    @property
+    def _thread(self) -> _DatabaseThread:
+        return self.ranking._thread
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.ranking._conn
+    
     # --- Points ---
     
-    def __load_points(self):
-        with closing(self.conn.cursor()) as cursor:
-            cursor.execute("""
-                SELECT date, points FROM ranking WHERE user_id = ?
-            """, (self.member.id,))
-            for row in cursor.fetchall():
-                self.__points[row['date']] = row['points']
-                
+    @_threaded
     def get_points(self, date: datetime | str | None = None) -> int:
         """Récupère le nombre de points d'un membre à une date donnée
 
@@ -121,32 +720,45 @@ class MemberRanking:
             date = datetime.now().strftime('%Y-%m-%d')
         if isinstance(date, datetime):
             date = date.strftime('%Y-%m-%d')
-        if date not in self.__points:
-            self.__load_points()
-        return self.__points.get(date, 0)
+        with closing(self.conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT COALESCE(SUM(points), 0) AS points FROM ranking_days WHERE user_id = ? AND date = ?
+            """, (self.member.id, date))
+            return cursor.fetchone()['points']
     
+    @_threaded
     def get_total_points(self) -> int:
         """Récupère le nombre total de points d'un membre
         
         :return: Nombre total de points du membre"""
         with closing(self.conn.cursor()) as cursor:
             cursor.execute("""
-                SELECT SUM(points) AS total_points
-                FROM ranking
-                WHERE user_id = ?
+                SELECT points FROM ranking_totals WHERE user_id = ?
             """, (self.member.id,))
-            return cursor.fetchone()['total_points'] or 0
+            row = cursor.fetchone()
+            return row['points'] if row else 0
     
+    @_threaded
     def get_cumulative_points(self, *, start: datetime | str | None = None, end: datetime | str | None = None) -> int:
         """Récupère le nombre de points cumulés d'un membre sur une période donnée
         
         :param start: Date de début (par défaut, 7 jours avant aujourd'hui)
         :param end: Date de fin (par défaut, aujourd'hui)
-        :return: Nombre de points cumulés du membre sur la période donnée"""
+        :return: Nombre de points cumulés du membre sur la période donnée
+        
+        Un début donné en `datetime` dans la rétention horaire est compté à l'heure près, sinon au jour près.
+        Les périodes déjà compactées (voir `GuildRanking.compact`) ne sont comptées qu'au mois près."""
         if not start:
             start = datetime.now() - timedelta(days=7)
         if not end:
             end = datetime.now()
+        if isinstance(start, datetime) and start >= datetime.now() - timedelta(hours=HOURLY_RETENTION_HOURS):
+            end_hour = end.strftime(HOUR_FORMAT) if isinstance(end, datetime) else f'{end} 23'
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT COALESCE(SUM(points), 0) AS total_points FROM ranking_hourly WHERE user_id = ? AND hour BETWEEN ? AND ?
+                """, (self.member.id, start.strftime(HOUR_FORMAT), end_hour))
+                return cursor.fetchone()['total_points']
         if isinstance(start, datetime):
             start = start.strftime('%Y-%m-%d')
         if isinstance(end, datetime):
@@ -154,66 +766,137 @@ class MemberRanking:
         
         with closing(self.conn.cursor()) as cursor:
             cursor.execute("""
-                SELECT SUM(points) AS total_points
-                FROM ranking
-                WHERE user_id = ? AND date BETWEEN ? AND ?
-            """, (self.member.id, start, end))
+                SELECT (SELECT COALESCE(SUM(points), 0) FROM ranking_days WHERE user_id = ? AND date BETWEEN ? AND ?)
+                     + (SELECT COALESCE(SUM(points), 0) FROM ranking_monthly WHERE user_id = ? AND month BETWEEN ? AND ?) AS total_points
+            """, (self.member.id, start, end, self.member.id, start[:7], end[:7]))
             return cursor.fetchone()['total_points'] or 0
-    
-    def set_points(self, points: int, date: datetime | str | None = None):
-        """Définit le nombre de points d'un membre à une date donnée
         
-        :param points: Nombre de points
-        :param date: Date à laquelle définir les points (par défaut, aujourd'hui)"""
-        if not date:
-            date = datetime.now().strftime('%Y-%m-%d')
-        if isinstance(date, datetime):
-            date = date.strftime('%Y-%m-%d')
-        self.__points[date] = points
+    @_threaded
+    def get_hourly_points(self, hours: int = 24) -> list[tuple[str, int]]:
+        """Récupère les points d'un membre heure par heure (courbe d'activité)
         
+        :param hours: Nombre d'heures à récupérer (dans la limite de la rétention horaire)
+        :return: Points par heure (`AAAA-MM-JJ HH`), de la plus ancienne à la plus récente, heures sans points comprises"""
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        hours = min(hours, HOURLY_RETENTION_HOURS)
         with closing(self.conn.cursor()) as cursor:
             cursor.execute("""
-                INSERT OR REPLACE INTO ranking (user_id, date, points) VALUES (?, ?, ?)
-            """, (self.member.id, date, points))
-            self.conn.commit()
+                SELECT hour, points FROM ranking_hourly WHERE user_id = ? AND hour > ?
+            """, (self.member.id, (now - timedelta(hours=hours)).strftime(HOUR_FORMAT)))
+            points = {row['hour']: row['points'] for row in cursor.fetchall()}
+        buckets = [(now - timedelta(hours=h)).strftime(HOUR_FORMAT) for h in reversed(range(hours))]
+        return [(hour, points.get(hour, 0)) for hour in buckets]
+    
+    @_threaded
+    def set_points(self, points: int, date: datetime | str | None = None, *, source: str = 'manual'):
+        """Définit le nombre de points d'un membre à une date donnée
+        
+        La différence avec le nombre de points actuel est enregistrée dans le registre.
+        
+        :param points: Nombre de points
+        :param date: Date à laquelle définir les points (par défaut, aujourd'hui)
+        :param source: Origine de la modification"""
+        delta = points - self.get_points(date)
+        if delta:
+            self.add_points(delta, date, source=source)
             
-    def add_points(self, points: int, date: datetime | str | None = None):
+    @_threaded
+    def add_points(self, points: int, date: datetime | str | None = None, *, source: str = 'manual'):
         """Ajoute des points à un membre
 
         :param points: Nombre de points à ajouter
-        :param date: Date à laquelle ajouter les points (par défaut, aujourd'hui)
+        :param date: Date à laquelle ajouter les points (par défaut, maintenant)
+        :param source: Origine de l'attribution (ex. `fortune.submit`)
         """
-        self.set_points(self.get_points(date) + points, date)
+        if isinstance(date, str):
+            timestamp = _date_timestamp(date)
+        else:
+            timestamp = (date or datetime.now()).timestamp()
+        with closing(self.conn.cursor()) as cursor:
+            _insert_events(cursor, [(self.member.id, timestamp, points, source)], self.ranking._decay_epoch)
+            self.conn.commit()
         
-    def remove_points(self, points: int, date: datetime | str | None = None):
+    @_threaded
+    def remove_points(self, points: int, date: datetime | str | None = None, *, source: str = 'manual'):
         """Retire des points à un membre
         
         :param points: Nombre de points à retirer
-        :param date: Date à laquelle retirer les points (par défaut, aujourd'hui)
+        :param date: Date à laquelle retirer les points (par défaut, maintenant)
+        :param source: Origine du retrait
         """
-        self.set_points(self.get_points(date) - points, date)
+        self.add_points(-points, date, source=source)
+        
+    @_threaded
+    def get_decayed_points(self) -> float:
+        """Récupère le prestige décroissant d'un membre (demi-vie de `DECAY_HALF_LIFE_DAYS` jours)
+        
+        :return: Prestige décroissant du membre à l'instant présent"""
+        with closing(self.conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT score FROM ranking_decay WHERE user_id = ?
+            """, (self.member.id,))
+            row = cursor.fetchone()
+            return _decayed_value(row['score'], self.ranking._decay_epoch) if row else 0.0
+        
+    @_threaded
+    def get_history(self, limit: int = 20) -> list[sqlite3.Row]:
+        """Récupère les dernières attributions de points d'un membre
+        
+        :param limit: Nombre d'attributions à récupérer
+        :return: Attributions (timestamp, delta, source), de la plus récente à la plus ancienne"""
+        with closing(self.conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT timestamp, delta, source FROM ranking_ledger
+                WHERE user_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (self.member.id, limit))
+            return cursor.fetchall()
         
     # --- Ranking ---
     
-    def get_personal_rank(self, days: int = 7) -> int:
+    @_threaded
+    def get_personal_rank(self, days: int = 7, *, mode: Literal['window', 'decay'] = 'window') -> int:
         """Récupère le rang personnel d'un membre sur une période donnée
         
-        :param days: Nombre de jours à prendre en compte
+        :param days: Nombre de jours à prendre en compte (mode `window`)
+        :param mode: `window` pour la somme des points sur `days` jours, `decay` pour le prestige décroissant
         :return: Rang personnel du membre"""
-        date = datetime.now() - timedelta(days=days)
+        if mode == 'decay':
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT 1 + (
+                        SELECT COUNT(*) FROM ranking_decay
+                        WHERE score > own.score AND user_id NOT IN (SELECT user_id FROM ranking_absent)
+                    ) AS rank
+                    FROM ranking_decay AS own
+                    WHERE own.user_id = ?
+                """, (self.member.id,))
+                row = cursor.fetchone()
+                return row['rank'] if row else 0
+        source, params = _window_source(days)
         with closing(self.conn.cursor()) as cursor:
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT user_id, SUM(points) AS total_points
-                FROM ranking
-                WHERE date >= ?
+                FROM ({source})
+                WHERE user_id NOT IN (SELECT user_id FROM ranking_absent)
                 GROUP BY user_id
                 ORDER BY total_points DESC
-            """, (date.strftime('%Y-%m-%d'),))
+            """, params)
             rows = cursor.fetchall()
             return next((i for i, row in enumerate(rows) if row['user_id'] == self.member.id), -1) + 1
         
+    @_threaded
+    def get_personal_ranks(self, periods: Sequence[int | None] = (1, 7, 30, None)) -> dict[int | None, int]:
+        """Récupère le rang personnel d'un membre sur plusieurs périodes en une seule lecture
+        
+        :param periods: Périodes en nombre de jours (`None` pour le classement de tous les temps)
+        :return: Rang personnel du membre pour chaque période (0 s'il n'est pas classé)"""
+        return _personal_ranks(self.ranking._get_period_scores(periods), self.member.id)
+        
     # --- Nettoyage ---
     
+    @_threaded
     def cleanup(self, days: int = 30):
         """Efface toutes les données de ranking de plus de `days` jours
         
@@ -223,18 +906,335 @@ class MemberRanking:
             cursor.execute("""
                 DELETE FROM ranking WHERE user_id = ? AND date < ?
             """, (self.member.id, date.strftime('%Y-%m-%d')))
+            cursor.execute("""
+                DELETE FROM ranking_hourly WHERE user_id = ? AND hour < ?
+            """, (self.member.id, date.strftime(HOUR_FORMAT)))
             self.conn.commit()
     
+    @_threaded
     def clear_all(self):
-        """Efface toutes les données de ranking du membre"""
+        """Remet à zéro toutes les données de ranking du membre
+        
+        Le registre n'est jamais réécrit : chaque heure où le membre a des points reçoit une attribution inverse (source `clear_all`),
+        que les triggers reportent dans les vues matérialisées et que le classement global reprend comme les autres."""
         with closing(self.conn.cursor()) as cursor:
             cursor.execute("""
-                DELETE FROM ranking WHERE user_id = ?
+                SELECT MIN(timestamp) AS timestamp, SUM(delta) AS delta FROM ranking_ledger
+                WHERE user_id = ?
+                GROUP BY strftime('%Y-%m-%d %H', timestamp, 'unixepoch', 'localtime')
+                HAVING SUM(delta) != 0
+            """, (self.member.id,))
+            events = [(self.member.id, row['timestamp'], -row['delta'], 'clear_all') for row in cursor.fetchall()]
+            _insert_events(cursor, events, self.ranking._decay_epoch)
+            # Lignes ramenées à zéro (et prestige résiduel, les poids variant dans l'heure) : le membre n'apparaît plus dans les classements
+            for table in ('ranking', 'ranking_hourly', 'ranking_totals'):
+                cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND points = 0", (self.member.id,))
+            cursor.execute("""
+                DELETE FROM ranking_decay WHERE user_id = ?
             """, (self.member.id,))
             self.conn.commit()
             
+    # --- Versions asynchrones ---
+    
+    aget_points = _awaitable(get_points)
+    aget_total_points = _awaitable(get_total_points)
+    aget_cumulative_points = _awaitable(get_cumulative_points)
+    aget_hourly_points = _awaitable(get_hourly_points)
+    aset_points = _awaitable(set_points)
+    aadd_points = _awaitable(add_points)
+    aremove_points = _awaitable(remove_points)
+    aget_decayed_points = _awaitable(get_decayed_points)
+    aget_history = _awaitable(get_history)
+    aget_personal_rank = _awaitable(get_personal_rank)
+    aget_personal_ranks = _awaitable(get_personal_ranks)
+    acleanup = _awaitable(cleanup)
+    aclear_all = _awaitable(clear_all)
+            
+class GlobalRanking:
+    def __init__(self):
+        """Classe de gestion du classement global (tous serveurs confondus)
+        
+        Alimenté incrémentalement à partir des registres de chaque serveur (voir `refresh`)."""
+        self.db = DB_PATH / 'Ranking_global.db'
+        
+        self._conn : sqlite3.Connection
+        self._thread = _DatabaseThread('rankio-global', self.__open)
+        
+    def __repr__(self) -> str:
+        return f'<GlobalRanking db={self.db!r}>'
+    
+    def __del__(self):
+        self._thread.close(self.__close)
+        
+    # --- Base de données ---
+    
+    def __open(self):
+        self._conn = self._connect()
+        self._initialize()
+        
+    def __close(self):
+        if hasattr(self, '_conn'):
+            self._conn.close()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if not DB_PATH.exists():
+            DB_PATH.mkdir()
+        db = sqlite3.connect(self.db)
+        db.row_factory = sqlite3.Row
+        return db
+    
+    def _initialize(self):
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS global_ranking (
+                    user_id INTEGER PRIMARY KEY,
+                    points INTEGER DEFAULT 0
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS global_ranking_points ON global_ranking (points)
+            """)
+            # Contribution de chaque serveur, pour pouvoir la retirer si son registre est modifié ou recréé
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'global_contributions'")
+            new_contributions = cursor.fetchone() is None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS global_contributions (
+                    guild_id INTEGER,
+                    user_id INTEGER,
+                    points INTEGER DEFAULT 0,
+                    PRIMARY KEY (guild_id, user_id)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS global_sync (
+                    guild_id INTEGER PRIMARY KEY,
+                    last_event_id INTEGER DEFAULT 0,
+                    ledger_id TEXT
+                )
+            """)
+            if 'ledger_id' not in [row['name'] for row in cursor.execute("PRAGMA table_info(global_sync)").fetchall()]:
+                cursor.execute("ALTER TABLE global_sync ADD COLUMN ledger_id TEXT")
+            if new_contributions:
+                # Classement créé sans le détail par serveur : reconstruit en entier à partir des registres
+                cursor.execute("DELETE FROM global_ranking")
+                cursor.execute("DELETE FROM global_sync")
+            self._conn.commit()
+            
+    # --- Synchronisation ---
+    
+    @_threaded
+    def refresh(self, ranking: GuildRanking, *, batch_size: int = LEDGER_BATCH_SIZE) -> int:
+        """Reporte dans le classement global les attributions d'un serveur enregistrées depuis la dernière synchronisation
+        
+        Si le registre n'est plus celui déjà reporté (identifiant différent : attributions supprimées ou base du serveur recréée),
+        la contribution du serveur est retirée puis recalculée en entier.
+        
+        :param ranking: Classement du serveur à synchroniser
+        :param batch_size: Nombre d'attributions traitées par transaction
+        :return: Nombre d'attributions reportées"""
+        guild_id = ranking.guild.id
+        count = 0
+        ledger_id = ranking._get_ledger_id()
+        with closing(self._conn.cursor()) as cursor:
+            row = cursor.execute("SELECT last_event_id, ledger_id FROM global_sync WHERE guild_id = ?", (guild_id,)).fetchone()
+            last_id = row['last_event_id'] if row else 0
+            if row and row['ledger_id'] != ledger_id:
+                self.__remove_contribution(cursor, guild_id)
+                last_id = 0
+            cursor.execute("""
+                INSERT OR REPLACE INTO global_sync (guild_id, last_event_id, ledger_id) VALUES (?, ?, ?)
+            """, (guild_id, last_id, ledger_id))
+            self._conn.commit()
+            
+            while events := ranking._get_events_after(last_id, batch_size):
+                deltas : dict[int, int] = {}
+                for event in events:
+                    deltas[event['user_id']] = deltas.get(event['user_id'], 0) + event['delta']
+                last_id = events[-1]['id']
+                cursor.executemany("""
+                    INSERT INTO global_ranking (user_id, points) VALUES (?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET points = points + excluded.points
+                """, list(deltas.items()))
+                cursor.executemany("""
+                    INSERT INTO global_contributions (guild_id, user_id, points) VALUES (?, ?, ?)
+                    ON CONFLICT (guild_id, user_id) DO UPDATE SET points = points + excluded.points
+                """, [(guild_id, user_id, points) for user_id, points in deltas.items()])
+                cursor.execute("""
+                    UPDATE global_sync SET last_event_id = ? WHERE guild_id = ?
+                """, (last_id, guild_id))
+                self._conn.commit()
+                count += len(events)
+        return count
+    
+    def __remove_contribution(self, cursor: sqlite3.Cursor, guild_id: int):
+        cursor.execute("""
+            UPDATE global_ranking SET points = points - (
+                SELECT points FROM global_contributions WHERE guild_id = ? AND user_id = global_ranking.user_id
+            )
+            WHERE user_id IN (SELECT user_id FROM global_contributions WHERE guild_id = ?)
+        """, (guild_id, guild_id))
+        cursor.execute("DELETE FROM global_contributions WHERE guild_id = ?", (guild_id,))
+        cursor.execute("""
+            DELETE FROM global_ranking WHERE points = 0 AND user_id NOT IN (SELECT user_id FROM global_contributions)
+        """)
+    
+    arefresh = _awaitable(refresh)
+    
+    # --- Classement ---
+    
+    @_threaded
+    def get_top(self, limit: int = 10) -> list[tuple[int, int]]:
+        """Récupère le classement global des utilisateurs
+        
+        :param limit: Nombre d'utilisateurs à afficher
+        :return: Liste des IDs d'utilisateurs classés et de leurs points"""
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT user_id, points FROM global_ranking ORDER BY points DESC LIMIT ?
+            """, (limit,))
+            return [(row['user_id'], row['points']) for row in cursor.fetchall()]
+        
+    @_threaded
+    def get_points(self, user: discord.abc.User) -> int:
+        """Récupère le nombre de points d'un utilisateur tous serveurs confondus
+        
+        :param user: Utilisateur concerné
+        :return: Nombre de points de l'utilisateur"""
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT points FROM global_ranking WHERE user_id = ?
+            """, (user.id,))
+            row = cursor.fetchone()
+            return row['points'] if row else 0
+        
+    @_threaded
+    def get_rank(self, user: discord.abc.User) -> int:
+        """Récupère le rang global d'un utilisateur
+        
+        :param user: Utilisateur concerné
+        :return: Rang global de l'utilisateur (0 s'il n'est pas classé)"""
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT 1 + (SELECT COUNT(*) FROM global_ranking WHERE points > own.points) AS rank
+                FROM global_ranking AS own
+                WHERE own.user_id = ?
+            """, (user.id,))
+            row = cursor.fetchone()
+            return row['rank'] if row else 0
+        
+    # --- Versions asynchrones ---
+    
+    aget_top = _awaitable(get_top)
+    aget_points = _awaitable(get_points)
+    aget_rank = _awaitable(get_rank)
+
 # ===== ACCES AUX DONNEES =====
 
+def _get_period_scores(conn: sqlite3.Connection, periods: Sequence[int | None]) -> dict[int | None, dict[int, int]]:
+    # Une seule requête : agrégation conditionnelle des points journaliers sur la plus longue fenêtre + totaux matérialisés
+    # (les fenêtres qui tiennent dans la rétention horaire sont comptées à l'heure près, celles qui la dépassent au mois près
+    # pour la partie déjà compactée)
+    days = sorted({p for p in periods if p is not None})
+    columns = []
+    params : list[Any] = []
+    for i, d in enumerate(days):
+        start = datetime.now() - timedelta(days=d)
+        if d * 24 <= HOURLY_RETENTION_HOURS:
+            columns.append(f'SUM(CASE WHEN hour >= ? THEN points END) AS p{i}')
+            params.append(start.strftime(HOUR_FORMAT))
+        elif d > RETENTION_DAYS:
+            columns.append(f'SUM(CASE WHEN date >= ? OR month >= ? THEN points END) AS p{i}')
+            params.extend((start.strftime('%Y-%m-%d'), start.strftime('%Y-%m')))
+        else:
+            columns.append(f'SUM(CASE WHEN date >= ? THEN points END) AS p{i}')
+            params.append(start.strftime('%Y-%m-%d'))
+    sources = []
+    if days:
+        start = datetime.now() - timedelta(days=days[-1])
+        sources.append('SELECT user_id, date, NULL AS hour, NULL AS month, points, NULL AS total FROM ranking WHERE date >= ?')
+        params.append(start.strftime('%Y-%m-%d'))
+        sources.append('SELECT user_id, substr(hour, 1, 10), hour, NULL, points, NULL FROM ranking_hourly')
+        if days[-1] > RETENTION_DAYS:
+            sources.append('SELECT user_id, NULL, NULL, month, points, NULL FROM ranking_monthly WHERE month >= ?')
+            params.append(start.strftime('%Y-%m'))
+    if None in periods:
+        columns.append('SUM(total) AS p_all')
+        sources.append('SELECT user_id, NULL, NULL, NULL, NULL, points FROM ranking_totals')
+    if not sources:
+        return {}
+    
+    # Les membres ayant quitté le serveur ne sont pas classés
+    scores : dict[int | None, dict[int, int]] = {p: {} for p in periods}
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(f"""
+            SELECT user_id, {', '.join(columns)}
+            FROM ({' UNION ALL '.join(sources)})
+            WHERE user_id NOT IN (SELECT user_id FROM ranking_absent)
+            GROUP BY user_id
+        """, params)
+        for row in cursor.fetchall():
+            for i, d in enumerate(days):
+                if row[f'p{i}'] is not None:
+                    scores[d][row['user_id']] = row[f'p{i}']
+            if None in periods and row['p_all'] is not None:
+                scores[None][row['user_id']] = row['p_all']
+    return scores
+
+def _personal_ranks(scores: dict[int | None, dict[int, int]], user_id: int) -> dict[int | None, int]:
+    ranks = {}
+    for period, period_scores in scores.items():
+        if user_id not in period_scores:
+            ranks[period] = 0
+            continue
+        own = period_scores[user_id]
+        ranks[period] = 1 + sum(1 for pts in period_scores.values() if pts > own)
+    return ranks
+
+def _window_source(days: int) -> tuple[str, tuple[str, ...]]:
+    # Points sur une fenêtre glissante, à la granularité la plus grossière qui y répond exactement (au mois près au-delà de la rétention)
+    start = datetime.now() - timedelta(days=days)
+    if days * 24 <= HOURLY_RETENTION_HOURS:
+        return 'SELECT user_id, points FROM ranking_hourly WHERE hour >= ?', (start.strftime(HOUR_FORMAT),)
+    if days > RETENTION_DAYS:
+        return ('SELECT user_id, points FROM ranking_days WHERE date >= ? UNION ALL SELECT user_id, points FROM ranking_monthly WHERE month >= ?',
+                (start.strftime('%Y-%m-%d'), start.strftime('%Y-%m')))
+    return 'SELECT user_id, points FROM ranking_days WHERE date >= ?', (start.strftime('%Y-%m-%d'),)
+
+def _insert_events(cursor: sqlite3.Cursor, events: list[tuple[int, float, int, str]], epoch: float) -> int:
+    # Registre en insertion seule (journalier et totaux suivent par trigger), prestige décroissant en ajout pur
+    # (poids calculés avant toute écriture : une erreur ne laisse pas de transaction à moitié écrite)
+    decay = [(user_id, delta * _decay_weight(timestamp, epoch), timestamp) for user_id, timestamp, delta, _ in events]
+    cursor.executemany("""
+        INSERT INTO ranking_ledger (user_id, timestamp, delta, source) VALUES (?, ?, ?, ?)
+    """, events)
+    cursor.executemany("""
+        INSERT INTO ranking_decay (user_id, score, last_update) VALUES (?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET score = score + excluded.score, last_update = MAX(last_update, excluded.last_update)
+    """, decay)
+    return len(events)
+
+def _renew_ledger_id(cursor: sqlite3.Cursor):
+    cursor.execute("UPDATE ranking_meta SET value = ? WHERE key = 'ledger_id'", (uuid.uuid4().hex,))
+
+def _decay_weight(timestamp: float, epoch: float) -> float:
+    return math.exp(math.log(2) * (timestamp - epoch) / (DECAY_HALF_LIFE_DAYS * 86400))
+
+def _decayed_value(score: float, epoch: float, at: float | None = None) -> float:
+    return score / _decay_weight(at if at is not None else datetime.now().timestamp(), epoch)
+
+def _month_start(date: datetime) -> datetime:
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _day_start() -> float:
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+def _db_path(guild_id: int) -> Path:
+    return DB_PATH / f'Ranking_{guild_id}.db'
+
+def _date_timestamp(date: str) -> float:
+    # Midi (heure locale) du jour donné, pour rester sur la bonne date quel que soit le décalage horaire
+    return datetime.strptime(date, '%Y-%m-%d').replace(hour=12).timestamp()
+
 @overload
 def get(obj: discord.Guild) -> GuildRanking: ...
 
@@ -254,3 +1254,87 @@ def get(obj: discord.Guild | discord.Member) -> GuildRanking | MemberRanking:
         return get(obj.guild).get_member(obj)
     else:
         raise TypeError(f'Invalid type {type(obj)} for get_ranking()')
+    
+@overload
+async def aget(obj: discord.Guild) -> GuildRanking: ...
+
+@overload
+async def aget(obj: discord.Member) -> MemberRanking: ...
+
+async def aget(obj: discord.Guild | discord.Member) -> GuildRanking | MemberRanking:
+    """Version asynchrone de `get` : attend l'ouverture de la base de données du serveur sans bloquer la boucle d'événements
+    
+    :param obj: Serveur ou membre Discord concerné
+    :return: Classement"""
+    ranking = get(obj)
+    await ranking._thread.ready()
+    return ranking
+
+def get_loaded(guild: discord.Guild) -> GuildRanking | None:
+    """Récupère le classement d'un serveur seulement s'il est déjà chargé (aucune base ni aucun thread n'est créé)
+    
+    :param guild: Serveur Discord concerné
+    :return: Classement, ou None s'il n'est pas chargé"""
+    return _RANKINGS.get(guild.id)
+    
+def get_global() -> GlobalRanking:
+    """Récupère le classement global (tous serveurs confondus)
+    
+    :return: Classement global"""
+    global _GLOBAL
+    if _GLOBAL is None:
+        _GLOBAL = GlobalRanking()
+    return _GLOBAL
+
+# ===== MAINTENANCE =====
+
+def _existing_rankings(guilds: Iterable[discord.Guild]) -> Iterator[GuildRanking]:
+    # Seuls les serveurs déjà classés (chargés ou avec une base sur le disque) : aucune base ni aucun thread n'est créé pour les autres
+    for guild in guilds:
+        if guild.id in _RANKINGS or _db_path(guild.id).exists():
+            yield get(guild)
+
+async def downsample_guilds(guilds: Iterable[discord.Guild], hours: int = HOURLY_RETENTION_HOURS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> dict[int, int]:
+    """Replie les points horaires de plusieurs serveurs en points journaliers en dehors de la boucle d'événements
+    
+    :param guilds: Serveurs concernés (ceux qui n'ont encore aucun classement sont ignorés)
+    :param hours: Nombre d'heures de détail à conserver
+    :param batch_size: Nombre de lignes traitées par transaction
+    :return: Nombre de lignes repliées par ID de serveur"""
+    results = {}
+    for ranking in _existing_rankings(guilds):
+        try:
+            results[ranking.guild.id] = await ranking.adownsample(hours, batch_size=batch_size)
+        except sqlite3.Error as e:
+            logger.error(f'Erreur lors du repli horaire de {ranking!r} : {e}', exc_info=True)
+    return results
+
+async def compact_guilds(guilds: Iterable[discord.Guild], days: int = RETENTION_DAYS, *, batch_size: int = COMPACTION_BATCH_SIZE) -> dict[int, int]:
+    """Compacte les données de ranking de plusieurs serveurs en dehors de la boucle d'événements
+    
+    :param guilds: Serveurs concernés (ceux qui n'ont encore aucun classement sont ignorés)
+    :param days: Nombre de jours de détail à conserver
+    :param batch_size: Nombre de lignes traitées par transaction
+    :return: Nombre de lignes compactées par ID de serveur"""
+    results = {}
+    for ranking in _existing_rankings(guilds):
+        try:
+            results[ranking.guild.id] = await ranking.acompact(days, batch_size=batch_size)
+        except sqlite3.Error as e:
+            logger.error(f'Erreur lors du compactage de {ranking!r} : {e}', exc_info=True)
+    return results
+
+async def refresh_global(guilds: Iterable[discord.Guild], *, batch_size: int = LEDGER_BATCH_SIZE) -> int:
+    """Synchronise le classement global avec les registres de plusieurs serveurs en dehors de la boucle d'événements
+    
+    :param guilds: Serveurs concernés (ceux qui n'ont encore aucun classement sont ignorés)
+    :param batch_size: Nombre d'attributions traitées par transaction
+    :return: Nombre total d'attributions reportées"""
+    glob = get_global()
+    count = 0
+    for ranking in _existing_rankings(guilds):
+        try:
+            count += await glob.arefresh(ranking, batch_size=batch_size)
+        except sqlite3.Error as e:
+            logger.error(f'Erreur lors de la synchronisation globale de {ranking!r} : {e}', exc_info=True)
+    return count
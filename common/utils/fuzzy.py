@@ -12,24 +12,68 @@ from __future__ import annotations
 
 import re
 import heapq
-from typing import Callable, Iterable, Literal, Optional, Sequence, TypeVar, Generator, overload
+import bisect
+import functools
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Generic, Hashable, Iterable, Iterator, Literal, Optional, Sequence, TypeVar, Generator, overload
 from difflib import SequenceMatcher
 
+import unidecode
+
 T = TypeVar('T')
+Backend = Literal['difflib', 'bitparallel']
+
+
+def _pattern_masks(a: str) -> dict[str, int]:
+    masks: dict[str, int] = {}
+    for i, c in enumerate(a):
+        masks[c] = masks.get(c, 0) | (1 << i)
+    return masks
+
+
+def _lcs_length(masks: dict[str, int], length: int, b: str) -> int:
+    # Bit-parallel LCS (Allison-Dix / Hyyrö): one addition per character of b, with
+    # the pattern side packed in an int. Its InDel distance (Levenshtein without
+    # substitutions) normalises to the same 2*M/T scale as SequenceMatcher.ratio.
+    full = (1 << length) - 1
+    v = full
+    for c in b:
+        u = v & masks.get(c, 0)
+        v = ((v + u) | (v - u)) & full
+    return length - v.bit_count()
+
+
+def _indel_ratio(masks: dict[str, int], a: str, b: str) -> float:
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+    return 2.0 * _lcs_length(masks, len(a), b) / total
 
 
-def ratio(a: str, b: str) -> int:
+def _ratio(a: str, b: str, backend: Backend = 'difflib') -> int:
+    if backend == 'bitparallel':
+        return int(round(100 * _indel_ratio(_pattern_masks(a), a, b)))
     m = SequenceMatcher(None, a, b)
     return int(round(100 * m.ratio()))
 
 
-def quick_ratio(a: str, b: str) -> int:
+def _quick_ratio(a: str, b: str, backend: Backend = 'difflib') -> int:
+    if backend == 'bitparallel':
+        # same bound as SequenceMatcher.quick_ratio, without building the matcher
+        total = len(a) + len(b)
+        if not total:
+            return 100
+        matches = sum((Counter(a) & Counter(b)).values())
+        return int(round(100 * (2.0 * matches / total)))
     m = SequenceMatcher(None, a, b)
     return int(round(100 * m.quick_ratio()))
 
 
-def partial_ratio(a: str, b: str) -> int:
+def _partial_ratio(a: str, b: str, backend: Backend = 'difflib') -> int:
     short, long = (a, b) if len(a) <= len(b) else (b, a)
+    if backend == 'bitparallel':
+        return _partial_ratio_bitparallel(short, long)
     m = SequenceMatcher(None, short, long)
 
     blocks = m.get_matching_blocks()
@@ -48,30 +92,155 @@ def partial_ratio(a: str, b: str) -> int:
     return int(round(100 * max(scores)))
 
 
+def _partial_ratio_bitparallel(short: str, long: str, masks: Optional[dict[str, int]] = None) -> int:
+    # every window of `long` that difflib's block alignment could pick (including the
+    # truncated ones at the end), with the masks of `short` built once
+    if not short:
+        return 100
+    if masks is None:
+        masks = _pattern_masks(short)
+    best = 0.0
+    for start in range(len(long)):
+        r = _indel_ratio(masks, short, long[start:start + len(short)])
+        if 100 * r > 99:
+            return 100
+        best = max(best, r)
+    return int(round(100 * best))
+
+
 _word_regex = re.compile(r'\W', re.IGNORECASE)
 
 
+@functools.lru_cache(maxsize=8192)
+def _normalize(a: str) -> str:
+    # accents and case folded ('Été' -> 'ete'), the key every scorer and `finder` compare.
+    # Cached: the same choices are usually scored against many queries.
+    return unidecode.unidecode(a).lower()
+
+
+@functools.lru_cache(maxsize=8192)
 def _sort_tokens(a: str) -> str:
-    a = _word_regex.sub(' ', a).lower().strip()
-    return ' '.join(sorted(a.split()))
+    return ' '.join(sorted(_word_regex.sub(' ', _normalize(a)).split()))
 
 
-def token_sort_ratio(a: str, b: str) -> int:
-    a = _sort_tokens(a)
-    b = _sort_tokens(b)
-    return ratio(a, b)
+def ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _ratio(_normalize(a), _normalize(b), backend)
 
 
-def quick_token_sort_ratio(a: str, b: str) -> int:
-    a = _sort_tokens(a)
-    b = _sort_tokens(b)
-    return quick_ratio(a, b)
+def quick_ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _quick_ratio(_normalize(a), _normalize(b), backend)
 
 
-def partial_token_sort_ratio(a: str, b: str) -> int:
-    a = _sort_tokens(a)
-    b = _sort_tokens(b)
-    return partial_ratio(a, b)
+def partial_ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _partial_ratio(_normalize(a), _normalize(b), backend)
+
+
+def token_sort_ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _ratio(_sort_tokens(a), _sort_tokens(b), backend)
+
+
+def quick_token_sort_ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _quick_ratio(_sort_tokens(a), _sort_tokens(b), backend)
+
+
+def partial_token_sort_ratio(a: str, b: str, *, backend: Backend = 'difflib') -> int:
+    return _partial_ratio(_sort_tokens(a), _sort_tokens(b), backend)
+
+
+class PreparedQuery:
+    """`scorer(query, choice)` with the query side computed once.
+
+    Scores are identical to calling the scorer directly. Unknown scorers are
+    wrapped as they are.
+    """
+
+    __slots__ = ('query', 'scorer', '_score')
+
+    def __init__(self, query: str, scorer: Callable[[str, str], int]) -> None:
+        self.query = query
+        self.scorer = scorer
+        func, backend = scorer, 'difflib'
+        if isinstance(scorer, functools.partial) and not scorer.args and set(scorer.keywords) <= {'backend'}:
+            func, backend = scorer.func, scorer.keywords.get('backend', 'difflib')
+
+        preparer = _PREPARERS.get(func)  # type: ignore
+        if preparer is not None:
+            self._score = preparer(query, backend)
+        else:
+            self._score = functools.partial(scorer, query)
+
+    def __call__(self, choice: str) -> int:
+        return self._score(choice)
+
+
+def prepare(query: str, scorer: Callable[[str, str], int] = quick_ratio) -> PreparedQuery:
+    return PreparedQuery(query, scorer)
+
+
+def _prepare_ratio(query: str, backend: Backend) -> Callable[[str], int]:
+    if backend == 'bitparallel':
+        masks = _pattern_masks(query)
+        return lambda choice: int(round(100 * _indel_ratio(masks, query, choice)))
+    # SequenceMatcher.ratio isn't symmetric, the query has to stay on the `a` side
+    return lambda choice: int(round(100 * SequenceMatcher(None, query, choice).ratio()))
+
+
+def _prepare_quick_ratio(query: str, backend: Backend) -> Callable[[str], int]:
+    if backend == 'bitparallel':
+        counts = Counter(query)
+
+        def score(choice: str) -> int:
+            total = len(query) + len(choice)
+            if not total:
+                return 100
+            matches = sum((counts & Counter(choice)).values())
+            return int(round(100 * (2.0 * matches / total)))
+        return score
+
+    # quick_ratio is symmetric: the query goes on the `b` side, whose counts the matcher caches
+    m = SequenceMatcher(None)
+    m.set_seq2(query)
+
+    def score(choice: str) -> int:
+        m.set_seq1(choice)
+        return int(round(100 * m.quick_ratio()))
+    return score
+
+
+def _prepare_partial_ratio(query: str, backend: Backend) -> Callable[[str], int]:
+    if backend == 'bitparallel':
+        masks = _pattern_masks(query)
+
+        def score(choice: str) -> int:
+            if len(query) <= len(choice):
+                return _partial_ratio_bitparallel(query, choice, masks)
+            return _partial_ratio_bitparallel(choice, query)
+        return score
+    return lambda choice: _partial_ratio(query, choice)
+
+
+def _prepare_processed(process: Callable[[str], str], base: Callable[[str, Backend], Callable[[str], int]]) -> Callable[[str, Backend], Callable[[str], int]]:
+    def preparer(query: str, backend: Backend) -> Callable[[str], int]:
+        score = base(process(query), backend)
+        return lambda choice: score(process(choice))
+    return preparer
+
+
+# preparers of the raw scorers, for keys that are already normalized
+_BASE_PREPARERS: dict[Callable[..., int], Callable[[str, Backend], Callable[[str], int]]] = {
+    _ratio: _prepare_ratio,
+    _quick_ratio: _prepare_quick_ratio,
+    _partial_ratio: _prepare_partial_ratio,
+}
+
+_PREPARERS: dict[Callable[..., int], Callable[[str, Backend], Callable[[str], int]]] = {
+    ratio: _prepare_processed(_normalize, _prepare_ratio),
+    quick_ratio: _prepare_processed(_normalize, _prepare_quick_ratio),
+    partial_ratio: _prepare_processed(_normalize, _prepare_partial_ratio),
+    token_sort_ratio: _prepare_processed(_sort_tokens, _prepare_ratio),
+    quick_token_sort_ratio: _prepare_processed(_sort_tokens, _prepare_quick_ratio),
+    partial_token_sort_ratio: _prepare_processed(_sort_tokens, _prepare_partial_ratio),
+}
 
 
 @overload
@@ -100,14 +269,15 @@ def _extraction_generator(
     scorer: Callable[[str, str], int] = quick_ratio,
     score_cutoff: int = 0,
 ) -> Generator[tuple[str, int, T] | tuple[str, int], None, None]:
+    prepared = prepare(query, scorer)
     if isinstance(choices, dict):
         for key, value in choices.items():
-            score = scorer(query, key)
+            score = prepared(key)
             if score >= score_cutoff:
                 yield (key, score, value)
     else:
         for choice in choices:
-            score = scorer(query, choice)
+            score = prepared(choice)
             if score >= score_cutoff:
                 yield (choice, score)
 
@@ -120,6 +290,7 @@ def extract(
     scorer: Callable[[str, str], int] = ...,
     score_cutoff: int = ...,
     limit: Optional[int] = ...,
+    stats: Optional[dict[str, int]] = ...,
 ) -> list[tuple[str, int]]:
     ...
 
@@ -132,6 +303,7 @@ def extract(
     scorer: Callable[[str, str], int] = ...,
     score_cutoff: int = ...,
     limit: Optional[int] = ...,
+    stats: Optional[dict[str, int]] = ...,
 ) -> list[tuple[str, int, T]]:
     ...
 
@@ -143,7 +315,16 @@ def extract(
     scorer: Callable[[str, str], int] = quick_ratio,
     score_cutoff: int = 0,
     limit: Optional[int] = 10,
+    stats: Optional[dict[str, int]] = None,
 ) -> list[tuple[str, int]] | list[tuple[str, int, T]]:
+    # `stats`, if given, receives the number of candidates pruned at each stage of the cascade
+    cascade = _cascade_for(scorer)
+    if cascade is not None and (score_cutoff > 0 or limit is not None):
+        process = cascade[0]
+        is_dict = isinstance(choices, dict)
+        items = choices.items() if is_dict else ((choice, None) for choice in choices)  # type: ignore
+        entries = ((key, value, process(key)) for key, value in items)
+        return _cascade_extract(query, entries, is_dict, cascade, score_cutoff, limit, stats)
     it = _extraction_generator(query, choices, scorer, score_cutoff)
     key = lambda t: t[1]
     if limit is not None:
@@ -151,6 +332,241 @@ def extract(
     return sorted(it, key=key, reverse=True)  # type: ignore
 
 
+_ScorerParts = tuple[Callable[[str], str], Callable[..., int], Backend]
+
+
+def _scorer_parts(scorer: Callable[[str, str], int]) -> Optional[_ScorerParts]:
+    # (normalization, raw scorer, backend) of the scorers defined here: the normalized
+    # keys are computed once per choice and only the raw scorer runs per comparison
+    func, backend = scorer, 'difflib'
+    if isinstance(scorer, functools.partial) and not scorer.args and set(scorer.keywords) <= {'backend'}:
+        func, backend = scorer.func, scorer.keywords.get('backend', 'difflib')
+    parts: dict[Callable[..., int], tuple[Callable[[str], str], Callable[..., int]]] = {
+        ratio: (_normalize, _ratio),
+        quick_ratio: (_normalize, _quick_ratio),
+        partial_ratio: (_normalize, _partial_ratio),
+        token_sort_ratio: (_sort_tokens, _ratio),
+        quick_token_sort_ratio: (_sort_tokens, _quick_ratio),
+        partial_token_sort_ratio: (_sort_tokens, _partial_ratio),
+    }
+    if func not in parts:
+        return None
+    process, base = parts[func]
+    return process, base, backend  # type: ignore
+
+
+def _cascade_for(scorer: Callable[[str, str], int]) -> Optional[_ScorerParts]:
+    # scorers bounded by the cascade: length ratio >= quick_ratio >= ratio, for both backends
+    parts = _scorer_parts(scorer)
+    if parts is None or parts[1] is _partial_ratio:
+        return None
+    return parts
+
+
+def _cascade_extract(
+    query: str,
+    entries: Iterable[tuple[str, T | None, str]],
+    is_dict: bool,
+    cascade: _ScorerParts,
+    score_cutoff: int,
+    limit: Optional[int],
+    stats: Optional[dict[str, int]],
+) -> list[tuple[str, int]] | list[tuple[str, int, T]]:
+    # Same results as the exhaustive path: a candidate is only dropped when an upper
+    # bound of its score is below the cutoff, or can't beat the k-th best (later
+    # candidates lose ties, like heapq.nlargest). real_quick_ratio is exactly the
+    # length ratio, so both are one arithmetic stage.
+    process, base, backend = cascade
+    q = process(query)
+    quick = _prepare_quick_ratio(q, backend)
+    full = quick if base is _quick_ratio else _BASE_PREPARERS[base](q, backend)
+    counts = {'candidates': 0, 'length': 0, 'quick': 0, 'full': 0, 'scored': 0}
+
+    results: list = []
+    heap: list[tuple[int, int, tuple]] = []
+    if limit is not None and limit <= 0:
+        entries = ()
+    for index, (key, value, c) in enumerate(entries):
+        counts['candidates'] += 1
+        if limit is not None and len(heap) >= limit:
+            threshold = max(score_cutoff, heap[0][0] + 1)
+        else:
+            threshold = score_cutoff
+
+        total = len(q) + len(c)
+        if total and int(round(100 * (2.0 * min(len(q), len(c)) / total))) < threshold:
+            counts['length'] += 1
+            continue
+        if full is not quick and quick(c) < threshold:
+            counts['quick'] += 1
+            continue
+        score = full(c)
+        counts['scored'] += 1
+        if score < threshold:
+            counts['full'] += 1
+            continue
+
+        entry = (key, score, value) if is_dict else (key, score)
+        if limit is None:
+            results.append(entry)
+        elif len(heap) < limit:
+            heapq.heappush(heap, (score, -index, entry))
+        else:
+            heapq.heapreplace(heap, (score, -index, entry))
+
+    if stats is not None:
+        stats.update(counts)
+    if limit is None:
+        return sorted(results, key=lambda t: t[1], reverse=True)
+    return [entry for _, _, entry in sorted(heap, key=lambda t: (-t[0], -t[1]))]
+
+
+class _Corpus:
+    # choices normalized once (accents, case, token sorting...) and indexed by length for several queries
+
+    def __init__(self, choices: dict[str, T] | Sequence[str], scorer: Callable[[str, str], int]) -> None:
+        self.choices = choices
+        self.scorer = scorer
+        self.parts = _scorer_parts(scorer)
+        self.is_dict = isinstance(choices, dict)
+        self.entries: list[tuple[str, T | None, str]] = []
+        if self.parts is not None:
+            process = self.parts[0]
+            items = choices.items() if self.is_dict else ((choice, None) for choice in choices)  # type: ignore
+            self.entries = [(key, value, process(key)) for key, value in items]
+        self.by_length = sorted(range(len(self.entries)), key=lambda i: len(self.entries[i][2]))
+        self.lengths = [len(self.entries[i][2]) for i in self.by_length]
+
+    def extract(self, query: str, score_cutoff: int, limit: Optional[int]) -> list:
+        if self.parts is None:
+            return extract(query, self.choices, scorer=self.scorer, score_cutoff=score_cutoff, limit=limit)
+        process, base, backend = self.parts
+        if base is not _partial_ratio and (score_cutoff > 0 or limit is not None):
+            return self._cascade(process(query), score_cutoff, limit)
+
+        prepared = _BASE_PREPARERS[base](process(query), backend)
+        it = []
+        for key, value, c in self.entries:
+            score = prepared(c)
+            if score >= score_cutoff:
+                it.append((key, score, value) if self.is_dict else (key, score))
+        if limit is not None:
+            return heapq.nlargest(limit, it, key=lambda t: t[1])
+        return sorted(it, key=lambda t: t[1], reverse=True)
+
+    def _cascade(self, q: str, score_cutoff: int, limit: Optional[int]) -> list:
+        # Same bounds as `_cascade_extract`, but the choices are visited from the closest
+        # length outwards: the length bound only decreases, so the scan stops as soon as
+        # it can't reach the cutoff or the k-th best. Ties are settled on the original
+        # index, which gives the same order as the exhaustive path.
+        assert self.parts is not None
+        _, base, backend = self.parts
+        quick = _prepare_quick_ratio(q, backend)
+        full = quick if base is _quick_ratio else _BASE_PREPARERS[base](q, backend)
+        if limit is not None and limit <= 0:
+            return []
+
+        def bound(length: int) -> int:
+            total = len(q) + length
+            return 100 if not total else int(round(100 * (2.0 * min(len(q), length) / total)))
+
+        heap: list[tuple[int, int, tuple]] = []
+        results: list[tuple[int, int, tuple]] = []
+        right = bisect.bisect_left(self.lengths, len(q))
+        left = right - 1
+        while left >= 0 or right < len(self.lengths):
+            if right < len(self.lengths) and (left < 0 or bound(self.lengths[right]) >= bound(self.lengths[left])):
+                pos, right = right, right + 1
+            else:
+                pos, left = left, left - 1
+            best = bound(self.lengths[pos])
+            full_heap = limit is not None and len(heap) >= limit
+            if best < score_cutoff or (full_heap and best < heap[0][0]):
+                break
+
+            index = self.by_length[pos]
+            key, value, c = self.entries[index]
+            if full is not quick:
+                upper = quick(c)
+                if upper < score_cutoff or (full_heap and (upper, -index) <= heap[0][:2]):
+                    continue
+            score = full(c)
+            if score < score_cutoff or (full_heap and (score, -index) <= heap[0][:2]):
+                continue
+
+            item = (score, -index, (key, score, value) if self.is_dict else (key, score))
+            if limit is None:
+                results.append(item)
+            elif not full_heap:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heapreplace(heap, item)
+        return [entry for _, _, entry in sorted(heap if limit is not None else results, key=lambda t: (-t[0], -t[1]))]
+
+
+_worker_corpus: Optional[tuple[_Corpus, int, Optional[int]]] = None
+
+
+def _init_extract_worker(corpus: _Corpus, score_cutoff: int, limit: Optional[int]) -> None:
+    global _worker_corpus
+    _worker_corpus = (corpus, score_cutoff, limit)
+
+
+def _extract_worker(queries: Sequence[str]) -> list[list]:
+    assert _worker_corpus is not None
+    corpus, score_cutoff, limit = _worker_corpus
+    return [corpus.extract(query, score_cutoff, limit) for query in queries]
+
+
+@overload
+def extract_many(
+    queries: Sequence[str],
+    choices: Sequence[str],
+    *,
+    scorer: Callable[[str, str], int] = ...,
+    score_cutoff: int = ...,
+    limit: Optional[int] = ...,
+    processes: Optional[int] = ...,
+    chunk_size: int = ...,
+) -> list[list[tuple[str, int]]]:
+    ...
+
+
+@overload
+def extract_many(
+    queries: Sequence[str],
+    choices: dict[str, T],
+    *,
+    scorer: Callable[[str, str], int] = ...,
+    score_cutoff: int = ...,
+    limit: Optional[int] = ...,
+    processes: Optional[int] = ...,
+    chunk_size: int = ...,
+) -> list[list[tuple[str, int, T]]]:
+    ...
+
+
+def extract_many(
+    queries: Sequence[str],
+    choices: dict[str, T] | Sequence[str],
+    *,
+    scorer: Callable[[str, str], int] = quick_ratio,
+    score_cutoff: int = 0,
+    limit: Optional[int] = 10,
+    processes: Optional[int] = None,
+    chunk_size: int = 64,
+) -> list[list[tuple[str, int]]] | list[list[tuple[str, int, T]]]:
+    # `extract` for each query, with the choices preprocessed once. With `processes`,
+    # batches larger than `chunk_size` are spread over a process pool (the scorer and
+    # the choices have to be picklable).
+    corpus = _Corpus(choices, scorer)
+    if processes and len(queries) > chunk_size:
+        chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_extract_worker, initargs=(corpus, score_cutoff, limit)) as pool:
+            return [result for chunk in pool.map(_extract_worker, chunks) for result in chunk]
+    return [corpus.extract(query, score_cutoff, limit) for query in queries]
+
+
 @overload
 def extract_one(
     query: str,
@@ -180,6 +596,9 @@ def extract_one(
     scorer: Callable[[str, str], int] = quick_ratio,
     score_cutoff: int = 0,
 ) -> Optional[tuple[str, int]] | Optional[tuple[str, int, T]]:
+    if _cascade_for(scorer) is not None:
+        matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=1)
+        return matches[0] if matches else None  # type: ignore
     it = _extraction_generator(query, choices, scorer, score_cutoff)
     key = lambda t: t[1]
     try:
@@ -330,28 +749,218 @@ def finder(
     raw: bool = False,
 ) -> list[tuple[int, int, T]] | list[T]:
     suggestions: list[tuple[int, int, T]] = []
-    text = str(text)
-    pat = '.*?'.join(map(re.escape, text))
-    regex = re.compile(pat, flags=re.IGNORECASE)
+    text = _normalize(str(text))
     for item in collection:
         to_search = key(item) if key else str(item)
-        r = regex.search(to_search)
+        r = _subsequence_match(text, _normalize(to_search))
         if r:
-            suggestions.append((len(r.group()), r.start(), item))
+            suggestions.append((r[0], r[1], item))
+    return _sort_suggestions(suggestions, key=key, raw=raw)
+
+
+def _subsequence_match(query: str, text: str) -> Optional[tuple[int, int]]:
+    # Same (length, start) as searching '.*?'.join(query) in text, with one linear scan:
+    # the leftmost match starts at the first occurrence of query[0] (any later start
+    # could also be completed from there) and the lazy groups take the earliest
+    # occurrence of each following character.
+    if not query:
+        return 0, 0
+    start = pos = text.find(query[0])
+    if start < 0:
+        return None
+    for char in query[1:]:
+        pos = text.find(char, pos + 1)
+        if pos < 0:
+            return None
+    return pos + 1 - start, start
 
-    def sort_key(tup: tuple[int, int, T]) -> tuple[int, int, str | T]:
-        if key:
-            return tup[0], tup[1], key(tup[2])
-        return tup
 
+def _sort_suggestions(
+    suggestions: list[tuple[int, int, T]],
+    *,
+    key: Optional[Callable[[T], str]] = None,
+    raw: bool = False,
+) -> list[tuple[int, int, T]] | list[T]:
+    sort_key = _suggestion_sort_key(key)
     if raw:
         return sorted(suggestions, key=sort_key)
     else:
         return [z for _, _, z in sorted(suggestions, key=sort_key)]
 
 
+def _suggestion_sort_key(key: Optional[Callable[[T], str]]) -> Callable[[tuple[int, int, T]], tuple[int, int, str | T]]:
+    def sort_key(tup: tuple[int, int, T]) -> tuple[int, int, str | T]:
+        if key:
+            return tup[0], tup[1], key(tup[2])
+        return tup
+    return sort_key
+
+
 def find(text: str, collection: Iterable[str], *, key: Optional[Callable[[str], str]] = None) -> Optional[str]:
     try:
         return finder(text, collection, key=key)[0]
     except IndexError:
-        return None
\ No newline at end of file
+        return None
+
+
+class FuzzyIndex(Generic[T]):
+    """Reusable index for `finder`-style lookups over a changing collection.
+
+    Every character of the query has to appear in a match, so an inverted index
+    from (accent and case folded) characters to items narrows the candidates before the
+    subsequence search. Results and ordering are the same as `finder` over the
+    items in insertion order.
+    """
+
+    def __init__(self, collection: Iterable[T] = (), *, key: Optional[Callable[[T], str]] = None) -> None:
+        self.key = key
+        self._items: dict[int, tuple[T, str]] = {}  # slot -> (item, folded key)
+        self._slots: dict[T, list[int]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._next_slot = 0
+        for item in collection:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._slots
+
+    def __iter__(self) -> Iterator[T]:
+        return (item for item, _ in self._items.values())
+
+    def add(self, item: T) -> None:
+        to_search = _normalize(self.key(item) if self.key else str(item))
+        slot = self._next_slot
+        self._next_slot += 1
+        self._items[slot] = (item, to_search)
+        self._slots.setdefault(item, []).append(slot)
+        for char in set(to_search):
+            self._postings.setdefault(char, set()).add(slot)
+
+    def remove(self, item: T) -> None:
+        # removes one occurrence, like list.remove
+        slots = self._slots.get(item)
+        if not slots:
+            raise KeyError(item)
+        slot = slots.pop(0)
+        if not slots:
+            del self._slots[item]
+        _, to_search = self._items.pop(slot)
+        for char in set(to_search):
+            posting = self._postings[char]
+            posting.discard(slot)
+            if not posting:
+                del self._postings[char]
+
+    def discard(self, item: T) -> None:
+        if item in self._slots:
+            self.remove(item)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._slots.clear()
+        self._postings.clear()
+
+    def candidates(self, text: str) -> list[int]:
+        chars = set(_normalize(str(text)))
+        if not chars:
+            return list(self._items)
+        postings = []
+        for char in chars:
+            posting = self._postings.get(char)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        found = postings[0].intersection(*postings[1:])
+        # insertion order keeps ties in the same order as `finder`
+        return sorted(found)
+
+    def entries(self, text: str) -> list[tuple[T, str]]:
+        # candidates with their folded keys, as scanned by `AutocompleteCache`
+        return [self._items[slot] for slot in self.candidates(text)]
+
+    @overload
+    def finder(self, text: str, *, raw: Literal[True]) -> list[tuple[int, int, T]]:
+        ...
+
+    @overload
+    def finder(self, text: str, *, raw: Literal[False] = ...) -> list[T]:
+        ...
+
+    def finder(self, text: str, *, raw: bool = False) -> list[tuple[int, int, T]] | list[T]:
+        suggestions: list[tuple[int, int, T]] = []
+        query = _normalize(str(text))
+        for slot in self.candidates(text):
+            item, to_search = self._items[slot]
+            r = _subsequence_match(query, to_search)
+            if r:
+                suggestions.append((r[0], r[1], item))
+        return _sort_suggestions(suggestions, key=self.key, raw=raw)
+
+    def find(self, text: str) -> Optional[T]:
+        try:
+            return self.finder(text)[0]
+        except IndexError:
+            return None
+
+
+class AutocompleteCache(Generic[T]):
+    """`finder` for autocomplete handlers, called again on every keystroke.
+
+    For each scope (typically guild, user and command) the items matching the last
+    query are kept: when the new query extends it, only those can still match, so
+    only they are rescanned. Entries are dropped when the corpus version given by
+    the caller changes. Results are the first `limit` of `finder`, picked with a
+    heap instead of a full sort.
+
+    The collection can be a `FuzzyIndex` (with the same key): on a cache miss only
+    the items it keeps for the query are scanned, with keys folded once by the index.
+    """
+
+    def __init__(self, *, key: Optional[Callable[[T], str]] = None, limit: int = 25, max_entries: int = 1024) -> None:
+        self.key = key
+        self.limit = limit
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[Hashable, str, list[tuple[T, str]]]] = OrderedDict()
+
+    def finder(
+        self,
+        scope: Hashable,
+        version: Hashable,
+        text: str,
+        collection: Iterable[T] | Callable[[], Iterable[T]],
+    ) -> list[T]:
+        # `collection` can be a callable, only called when the cache can't be used
+        query = _normalize(str(text))
+        entry = self._entries.get(scope)
+        if entry is not None and entry[0] == version and query.startswith(entry[1]):
+            candidates = entry[2]
+        else:
+            items = collection() if callable(collection) else collection
+            if isinstance(items, FuzzyIndex):
+                candidates = items.entries(query)
+            else:
+                candidates = [(item, _normalize(self.key(item) if self.key else str(item))) for item in items]
+
+        survivors: list[tuple[T, str]] = []
+        suggestions: list[tuple[int, int, T]] = []
+        for item, to_search in candidates:
+            r = _subsequence_match(query, to_search)
+            if r:
+                survivors.append((item, to_search))
+                suggestions.append((r[0], r[1], item))
+
+        self._entries[scope] = (version, query, survivors)
+        self._entries.move_to_end(scope)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return [z for _, _, z in heapq.nsmallest(self.limit, suggestions, key=_suggestion_sort_key(self.key))]
+
+    def invalidate(self, scope: Optional[Hashable] = None) -> None:
+        if scope is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(scope, None)